@@ -0,0 +1,153 @@
+import asyncio
+import os
+import re
+from collections import deque
+from typing import Optional
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Admission control / load shedding.
+#
+# Requests are classified into route classes. Each class has a cap on
+# concurrent requests and a short bounded queue; all classes also share a
+# total cap (roughly the DB pool size). When a slot frees up, queued
+# credential lookups are admitted before policy reads, and policy reads before
+# admin traffic. Requests that cannot be queued, or wait too long, get an
+# immediate 503 with Retry-After instead of piling up on the DB pool.
+
+CREDENTIALS = "credentials" # lakeFS authentication path
+POLICY_READS = "policy_reads"
+ADMIN = "admin" # lists, mutations, batch, reports
+
+# Highest priority first
+PRIORITY = [CREDENTIALS, POLICY_READS, ADMIN]
+
+_CREDENTIAL_LOOKUP = re.compile(r"^/api/v1/auth/(credentials/[^/]+(/bundle)?|users/[^/]+)$")
+_POLICY_READ = re.compile(r"^/api/v1/auth/(policies|users/[^/]+/policies|groups/[^/]+/policies)(/|$)")
+_UNLIMITED = {"/api/v1/healthcheck", "/api/v1/config/version"}
+
+def classify(method: str, path: str) -> Optional[str]:
+    """Route class of a request, or None if it is not subject to admission control."""
+    if not path.startswith("/api/v1/") or path in _UNLIMITED or path.startswith("/api/v1/debug/"):
+        return None
+    if method == "GET" and _CREDENTIAL_LOOKUP.match(path):
+        return CREDENTIALS
+    if method == "GET" and _POLICY_READ.match(path):
+        return POLICY_READS
+    return ADMIN
+
+class AdmissionController:
+    def __init__(self, total: int, limits: dict, queues: dict, queue_timeout: float):
+        self.total = total
+        self.limits = limits
+        self.queues = queues
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.class_in_flight = {c: 0 for c in PRIORITY}
+        self.waiters = {c: deque() for c in PRIORITY}
+        self.rejected = {c: 0 for c in PRIORITY}
+
+    def _can_run(self, cls: str) -> bool:
+        return self.in_flight < self.total and self.class_in_flight[cls] < self.limits[cls]
+
+    def _queued_at_or_above(self, cls: str) -> bool:
+        for c in PRIORITY:
+            if self.waiters[c]:
+                return True
+            if c == cls:
+                return False
+        return False
+
+    def _start(self, cls: str):
+        self.in_flight += 1
+        self.class_in_flight[cls] += 1
+
+    async def acquire(self, cls: str) -> bool:
+        """Returns True once the request may run, False if it should be shed."""
+        if self._can_run(cls) and not self._queued_at_or_above(cls):
+            self._start(cls)
+            return True
+
+        if len(self.waiters[cls]) >= self.queues[cls]:
+            self.rejected[cls] += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[cls].append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except BaseException:
+            # Cancelled while queued: hand back a slot we may already have been given
+            if waiter.done() and not waiter.cancelled():
+                self.release(cls)
+            else:
+                self._abandon(cls, waiter)
+            raise
+
+        # The slot is handed over by release(); anything else means we timed out
+        if waiter.done() and not waiter.cancelled():
+            return True
+        self._abandon(cls, waiter)
+        self.rejected[cls] += 1
+        return False
+
+    def _abandon(self, cls: str, waiter: asyncio.Future):
+        waiter.cancel()
+        try:
+            self.waiters[cls].remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, cls: str):
+        self.in_flight -= 1
+        self.class_in_flight[cls] -= 1
+        for c in PRIORITY:
+            while self.waiters[c] and self._can_run(c):
+                waiter = self.waiters[c].popleft()
+                if waiter.done():
+                    continue
+                self._start(c)
+                waiter.set_result(True)
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+def controller_from_env() -> AdmissionController:
+    defaults = {CREDENTIALS: (15, 64), POLICY_READS: (10, 32), ADMIN: (4, 16)}
+    return AdmissionController(
+        total=_env_int("ACL_ADMISSION_TOTAL", 15),
+        limits={c: _env_int(f"ACL_ADMISSION_{c.upper()}_LIMIT", d[0]) for c, d in defaults.items()},
+        queues={c: _env_int(f"ACL_ADMISSION_{c.upper()}_QUEUE", d[1]) for c, d in defaults.items()},
+        queue_timeout=float(os.getenv("ACL_ADMISSION_QUEUE_TIMEOUT", "2")),
+    )
+
+RETRY_AFTER = os.getenv("ACL_ADMISSION_RETRY_AFTER", "1")
+
+class AdmissionMiddleware:
+    def __init__(self, app: ASGIApp, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or controller_from_env()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cls = classify(scope["method"], scope["path"])
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.controller.acquire(cls):
+            response = JSONResponse(
+                {"detail": "Server busy, retry later"},
+                status_code=503,
+                headers={"Retry-After": RETRY_AFTER}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(cls)
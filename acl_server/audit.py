@@ -0,0 +1,131 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+from fastapi import Request
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from database import on_commit
+from models import AuditEvent
+
+# Asynchronous audit log for ACL mutations.
+#
+# Routers call record() with before/after snapshots of what they change. Events
+# are queued only once the mutating transaction commits, so rolled-back changes
+# (including failed batches) are never audited. A background task drains the
+# bounded in-process queue with multi-row INSERTs, off the request path. A
+# batch that fails to write goes back to the head of the queue and is retried
+# on the next drain. Events are only dropped (and counted) when the queue is
+# full, rather than blocking requests.
+
+QUEUE_SIZE = int(os.getenv("ACL_AUDIT_QUEUE_SIZE", "10000"))
+FLUSH_INTERVAL = float(os.getenv("ACL_AUDIT_FLUSH_INTERVAL", "1"))
+BATCH_SIZE = 500
+
+REDACTED = "<redacted>"
+
+_actor: ContextVar[str] = ContextVar("audit_actor", default="system")
+
+async def capture_actor(request: Request):
+    """
+    Router dependency: remembers who is making the call. All callers share the API
+    token, so the caller may name the acting user in X-Audit-Actor; otherwise the
+    client address is used. Must be async so the value is visible to sync routes.
+    """
+    actor = request.headers.get("X-Audit-Actor")
+    if not actor:
+        actor = request.client.host if request.client else "unknown"
+    _actor.set(actor)
+
+def diff(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+    """Reduces two snapshots to the fields that differ."""
+    before = before or {}
+    after = after or {}
+    keys = [k for k in {**before, **after} if before.get(k) != after.get(k)]
+    return (
+        {k: before[k] for k in keys if k in before} or None,
+        {k: after[k] for k in keys if k in after} or None,
+    )
+
+class AuditWriter:
+    def __init__(self, maxsize: int = QUEUE_SIZE):
+        self.maxsize = maxsize
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self.stats = {"enqueued": 0, "dropped": 0, "written": 0, "failed": 0}
+
+    def enqueue(self, event: Dict[str, Any]):
+        with self._lock:
+            if len(self._queue) >= self.maxsize:
+                self.stats["dropped"] += 1
+                return
+            self._queue.append(event)
+            self.stats["enqueued"] += 1
+
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def _take(self) -> list:
+        with self._lock:
+            return [self._queue.popleft() for _ in range(min(BATCH_SIZE, len(self._queue)))]
+
+    def _restore(self, rows: list):
+        """Puts a failed batch back at the head, oldest first, as far as the queue bound allows."""
+        with self._lock:
+            room = max(0, self.maxsize - len(self._queue))
+            self._queue.extendleft(reversed(rows[:room]))
+            # Events enqueued while the batch was out already took the rest of the room
+            self.stats["dropped"] += max(0, len(rows) - room)
+
+    def drain(self, engine: Engine) -> int:
+        """Writes everything queued, BATCH_SIZE rows per INSERT. Returns rows written."""
+        written = 0
+        while True:
+            rows = self._take()
+            if not rows:
+                return written
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(AuditEvent).values(rows))
+            except Exception as e:
+                # Retried on the next drain; stop now rather than spin on a failing database
+                self.stats["failed"] += len(rows)
+                self._restore(rows)
+                print(f"Failed to write {len(rows)} audit events, will retry: {e}")
+                return written
+            self.stats["written"] += len(rows)
+            written += len(rows)
+
+writer = AuditWriter()
+
+def record(
+    db: Session,
+    action: str,
+    target_type: str,
+    target_id: str,
+    before: Optional[Dict[str, Any]] = None,
+    after: Optional[Dict[str, Any]] = None,
+):
+    """Audits a mutation made in db's current transaction."""
+    changed_before, changed_after = diff(before, after)
+    event = {
+        "created_at": int(time.time()),
+        "actor": _actor.get(),
+        "action": action,
+        "target_type": target_type,
+        "target_id": target_id,
+        "before": changed_before,
+        "after": changed_after,
+    }
+    on_commit(db, lambda: writer.enqueue(event))
+
+async def run_writer(engine: Engine, interval: float = FLUSH_INTERVAL):
+    """Background task started by the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(writer.drain, engine)
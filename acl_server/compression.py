@@ -0,0 +1,117 @@
+import os
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError: # optional: pip install brotli
+    brotli = None
+
+# Response compression.
+#
+# Responses of at least MINIMUM_SIZE bytes are compressed with the best
+# encoding the client accepts: brotli when the brotli package is installed,
+# otherwise gzip. Streaming responses (reports) are compressed chunk by chunk.
+# Small responses, such as the credential lookups on the lakeFS hot path, are
+# passed through untouched.
+
+MINIMUM_SIZE = int(os.getenv("ACL_COMPRESS_MIN_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4 # brotli's default of 11 is far too slow for dynamic responses
+
+def _accepted(accept_encoding: str) -> dict:
+    """Encodings listed in an Accept-Encoding header, with their q-values."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    return accepted
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    accepted = _accepted(accept_encoding)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda e: accepted.get(e, 0.0))
+    return best if accepted.get(best, 0.0) > 0 else None
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) # 31: gzip container
+
+    def compress(self, data: bytes, last: bool) -> bytes:
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if last else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(raw=start["headers"])
+                if "content-encoding" in headers or (len(body) < self.minimum_size and not more_body):
+                    passthrough = True
+                else:
+                    compressor = _Compressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    del headers["Content-Length"]
+                    if not more_body:
+                        body = compressor.compress(body, last=True)
+                        headers["Content-Length"] = str(len(body))
+                        compressor = None
+                        message = dict(message, body=body)
+                await send(start)
+                start = None
+                if passthrough or compressor is None:
+                    await send(message)
+                    return
+
+            if passthrough:
+                await send(message)
+                return
+            await send(dict(message, body=compressor.compress(body, last=not more_body)))
+
+        await self.app(scope, receive, send_compressed)
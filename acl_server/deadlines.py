@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import time
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+import admission
+
+# Per-request database deadlines.
+#
+# get_db gives each session a deadline from the request's route class (see
+# admission.classify; reports are a separate, longer "export" class). Every
+# transaction the session begins is limited to the time left until then: on
+# Postgres with SET LOCAL statement_timeout, on SQLite with a progress handler
+# that interrupts the running statement. A statement that runs past the
+# deadline fails with an OperationalError that main.py turns into a 504, so a
+# pathological query gives its pooled connection back instead of holding it.
+
+EXPORT = "export"
+
+_DEFAULT_MS = {
+    admission.CREDENTIALS: 2000,
+    admission.POLICY_READS: 5000,
+    admission.ADMIN: 30000,
+    EXPORT: 300000,
+}
+
+# Milliseconds per route class; 0 disables
+TIMEOUTS_MS = {c: int(os.getenv(f"ACL_DEADLINE_{c.upper()}_MS", str(d))) for c, d in _DEFAULT_MS.items()}
+
+# SQLite calls the progress handler every this many VM instructions
+_SQLITE_PROGRESS_STEPS = 1000
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if path.startswith("/api/v1/reports/"):
+        return EXPORT
+    return admission.classify(method, path)
+
+def set_deadline(db: Session, timeout_ms: int):
+    """Limits db's transactions to end within timeout_ms from now."""
+    db.info["deadline"] = time.monotonic() + timeout_ms / 1000
+
+def apply(db: Session, request: Request):
+    timeout_ms = TIMEOUTS_MS.get(route_class(request.method, request.url.path), 0)
+    if timeout_ms > 0:
+        set_deadline(db, timeout_ms)
+
+def is_timeout(exc: OperationalError) -> bool:
+    """Whether a statement failed because its deadline passed."""
+    orig = exc.orig
+    if getattr(orig, "pgcode", None) == "57014": # query_canceled
+        return True
+    return isinstance(orig, sqlite3.OperationalError) and str(orig) == "interrupted"
+
+@event.listens_for(Session, "after_begin")
+def _limit_transaction(session, transaction, connection):
+    deadline = session.info.get("deadline")
+    if deadline is None:
+        return
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        # A deadline that has already passed cancels the first statement
+        remaining_ms = max(1, int((deadline - time.monotonic()) * 1000))
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {remaining_ms}")
+    elif dialect == "sqlite":
+        dbapi_connection = connection.connection.dbapi_connection
+        dbapi_connection.set_progress_handler(lambda: time.monotonic() > deadline, _SQLITE_PROGRESS_STEPS)
+        session.info.setdefault("deadline_connections", []).append(dbapi_connection)
+
+@event.listens_for(Session, "after_transaction_end")
+def _clear_sqlite_handlers(session, transaction):
+    # Pooled connections outlive the request; SET LOCAL needs no cleanup
+    if transaction.parent is None:
+        for dbapi_connection in session.info.pop("deadline_connections", []):
+            dbapi_connection.set_progress_handler(None, 0)
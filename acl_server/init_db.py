@@ -1,9 +1,18 @@
 
+from sqlalchemy import select, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
-from models import Group, Policy, User
+from models import Group, Policy, User, AclState, group_policies
+from migrations import run_migrations, SCHEMA_VERSION
+from locks import init_lock
+import statements
+import os
 import time
 import json
-from typing import List, Dict
+import hashlib
+import weakref
+from typing import List, Dict, Optional
 
 # --- Definitions ---
 POLICIES_DATA = [
@@ -65,52 +74,118 @@ GROUPS_DATA = {
     "Viewers": ["FSReadAll", "AuthManageOwnCredentials"]
 }
 
+SEED_FINGERPRINT_KEY = "seed_fingerprint"
+
+# How long a replica waits for another one to finish initialization
+INIT_LOCK_TIMEOUT = float(os.getenv("ACL_INIT_LOCK_TIMEOUT", "120"))
+
+# Engines initialization succeeded for in this process. Forked workers inherit
+# this from the serving parent and skip initialization entirely.
+_initialized = weakref.WeakSet()
+
+def seed_fingerprint() -> str:
+    """
+    Hash of everything startup initialization depends on: the schema version
+    and the seed definitions. If it matches the stored value there is nothing to do.
+    """
+    payload = json.dumps(
+        {"schema_version": SCHEMA_VERSION, "policies": POLICIES_DATA, "groups": GROUPS_DATA},
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def get_stored_fingerprint(engine: Engine) -> Optional[str]:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(AclState.value).where(AclState.key == SEED_FINGERPRINT_KEY)
+            ).scalar()
+    except DBAPIError:
+        # Table missing: database predates migrations or is empty
+        return None
+
 def init_db_data(db: Session):
+    """
+    Creates missing seed policies and groups and attaches missing group policies.
+    Existing rows are left untouched. Works on the whole seed set at once:
+    one query per table to find what exists, one bulk insert per table for the rest.
+    """
     print("Initializing Database Data...")
-    
-    # 1. Create Policies
-    for p_data in POLICIES_DATA:
-        policy_id = p_data["id"] # name in schema, id in model
-        existing = db.query(Policy).filter(Policy.id == policy_id).first()
-        if not existing:
-            print(f"Creating Policy: {policy_id}")
-            new_policy = Policy(
-                id=policy_id,
-                statement=p_data["statement"],
-                created_at=int(time.time()),
-                acl="public" # Optional default
-            )
-            db.add(new_policy)
-        else:
-            print(f"Policy {policy_id} already exists.")
-    
+    now = int(time.time())
+
+    # 1. Policies
+    seed_policy_ids = [p["id"] for p in POLICIES_DATA]
+    existing_policies = set(db.scalars(select(Policy.id).where(Policy.id.in_(seed_policy_ids))))
+    new_policies = [
+        {"id": p["id"], "statement_hashes": statements.intern_all(p["statement"]), "inline_statement": p["statement"], "created_at": now, "acl": "public"}
+        for p in POLICIES_DATA if p["id"] not in existing_policies
+    ]
+    if new_policies:
+        statements.store(db, [h for p in new_policies for h in p["statement_hashes"]])
+        db.execute(insert(Policy), new_policies)
+
+    # 2. Groups
+    existing_groups = set(db.scalars(select(Group.id).where(Group.id.in_(list(GROUPS_DATA)))))
+    new_groups = [
+        {"id": group_id, "description": f"Standard {group_id} group", "created_at": now}
+        for group_id in GROUPS_DATA if group_id not in existing_groups
+    ]
+    if new_groups:
+        db.execute(insert(Group), new_groups)
+
+    # 3. Group policy attachments (only for policies that exist)
+    known_policies = existing_policies | {p["id"] for p in new_policies}
+    existing_links = set(db.execute(
+        select(group_policies.c.group_id, group_policies.c.policy_id)
+        .where(group_policies.c.group_id.in_(list(GROUPS_DATA)))
+    ).tuples())
+    new_links = [
+        {"group_id": group_id, "policy_id": policy_id, "created_at": now}
+        for group_id, policy_ids in GROUPS_DATA.items()
+        for policy_id in policy_ids
+        if policy_id in known_policies and (group_id, policy_id) not in existing_links
+    ]
+    if new_links:
+        db.execute(group_policies.insert(), new_links)
+
     db.commit()
+    print(
+        f"Initialization Complete: created {len(new_policies)} policies, "
+        f"{len(new_groups)} groups, {len(new_links)} attachments."
+    )
+
+def initialize_database(engine: Engine) -> bool:
+    """
+    Migrates the schema and seeds default data, unless the stored seed
+    fingerprint shows this was already done for the current code.
+    Returns True if any work was performed.
+
+    Safe to call from many replicas at once: the work is done under a
+    database-wide lock, and replicas that waited for it re-check the
+    fingerprint and skip once the first one has finished.
+    """
+    if engine in _initialized:
+        return False
+
+    fingerprint = seed_fingerprint()
+    if get_stored_fingerprint(engine) == fingerprint:
+        _initialized.add(engine)
+        return False
+
+    with init_lock(engine, timeout=INIT_LOCK_TIMEOUT):
+        if get_stored_fingerprint(engine) == fingerprint:
+            print("Database was initialized by another instance.")
+            _initialized.add(engine)
+            return False
+
+        run_migrations(engine)
 
-    # 2. Create Groups & Attach Policies
-    for group_id, policies in GROUPS_DATA.items():
-        group = db.query(Group).filter(Group.id == group_id).first()
-        if not group:
-            print(f"Creating Group: {group_id}")
-            group = Group(
-                id=group_id, 
-                description=f"Standard {group_id} group", 
-                created_at=int(time.time())
-            )
-            db.add(group)
-            db.commit() # Commit to get ID reference if needed (though UUID string here)
-            db.refresh(group)
-        else:
-            print(f"Group {group_id} already exists.")
-        
-        # Attach Policies
-        current_policies = {p.id for p in group.policies}
-        for p_id in policies:
-            if p_id not in current_policies:
-                policy = db.query(Policy).filter(Policy.id == p_id).first()
-                if policy:
-                    print(f"Attaching {p_id} to {group_id}")
-                    group.policies.append(policy)
-        
-        db.commit()
-    
-    print("Initialization Complete.")
+        db = Session(bind=engine)
+        try:
+            init_db_data(db)
+            db.merge(AclState(key=SEED_FINGERPRINT_KEY, value=fingerprint, updated_at=int(time.time())))
+            db.commit()
+        finally:
+            db.close()
+    _initialized.add(engine)
+    return True
@@ -0,0 +1,61 @@
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+import fcntl
+import os
+import time
+
+# Serializes startup initialization across replicas/processes sharing a database.
+# Postgres: session-level advisory lock. SQLite: exclusive flock on a file next to
+# the database. In-memory/unknown databases: no lock (nothing to share).
+
+INIT_LOCK_KEY = 0x6C616B6566736163 # "lakefsac"
+POLL_INTERVAL = 0.5
+
+@contextmanager
+def _postgres_lock(engine: Engine, key: int, timeout: float):
+    conn = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        deadline = time.monotonic() + timeout
+        while not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar():
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out after {timeout}s waiting for advisory lock {key}")
+            time.sleep(POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+    finally:
+        conn.close()
+
+@contextmanager
+def _file_lock(path: str, timeout: float):
+    with open(path, "a") as f:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Timed out after {timeout}s waiting for lock file {path}")
+                time.sleep(POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+@contextmanager
+def init_lock(engine: Engine, timeout: float = 120.0, key: int = INIT_LOCK_KEY):
+    """
+    Holds an exclusive, database-wide lock for the duration of the block.
+    Raises TimeoutError if another holder does not release it within `timeout` seconds.
+    """
+    if engine.dialect.name == "postgresql":
+        with _postgres_lock(engine, key, timeout):
+            yield
+    elif engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        with _file_lock(os.path.abspath(engine.url.database) + ".init.lock", timeout):
+            yield
+    else:
+        yield
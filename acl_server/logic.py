@@ -1,4 +1,6 @@
 
+import re
+from functools import lru_cache
 from typing import List
 from models import User, Policy
 
@@ -20,3 +22,13 @@ def get_effective_policies(user: User) -> List[Policy]:
             policies[p.id] = p
             
     return list(policies.values())
+
+@lru_cache(maxsize=4096)
+def _wildcard_regex(pattern: str):
+    return re.compile("".join(
+        ".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern
+    ), re.DOTALL)
+
+def wildcard_match(pattern: str, value: str) -> bool:
+    """lakeFS policy matching: `*` matches any run of characters, `?` exactly one."""
+    return _wildcard_regex(pattern).fullmatch(value) is not None
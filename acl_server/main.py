@@ -1,45 +1,88 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import OperationalError
+import asyncio
 from contextlib import asynccontextmanager
-from database import engine, Base
+from database import engine, read_engine, Base, DATABASE_URL, is_embedded_sqlite, run_sqlite_maintenance
 import models
-from routers import users, groups, policies, credentials
+from routers import users, groups, policies, credentials, batch, audit_log, reports, debug
 from schemas import VersionConfig
 import security
+import admission
+import usage
+import audit
+import slow_queries
+import tracing
+import deadlines
+import compression
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+from init_db import initialize_database
 
-from init_db import init_db_data
-from database import SessionLocal
+for bind in {engine, read_engine}:
+    slow_queries.install(bind)
+    tracing.install(bind)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize DB
-    db = SessionLocal()
-    try:
-        init_db_data(db)
-    finally:
-        db.close()
+    # Startup: Migrate schema and seed data (a single fingerprint query when up to date)
+    initialize_database(engine)
+    background = [
+        asyncio.create_task(usage.run_flusher(engine)),
+        asyncio.create_task(audit.run_writer(engine)),
+    ]
+    if is_embedded_sqlite(DATABASE_URL):
+        background.append(asyncio.create_task(run_sqlite_maintenance(engine)))
     yield
-    # Shutdown logic (if any) goes here
+    # Shutdown: stop background writers and flush what they buffered
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    # Separately, so a failing usage flush cannot cost the audit events
+    try:
+        usage.tracker.flush(engine)
+    except Exception as e:
+        print(f"Failed to flush credential usage on shutdown: {e}")
+    try:
+        audit.writer.drain(engine)
+    except Exception as e:
+        print(f"Failed to write audit events on shutdown: {e}")
 
 app = FastAPI(
     title="LakeFS ACL Server",
     description="Python implementation of LakeFS Auth API",
     version="0.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=tracing.TracedJSONResponse
 )
 
+# Innermost: compresses large responses (lists, reports) once they are rendered
+app.add_middleware(compression.CompressionMiddleware)
+# Shed load before it reaches the DB pool; credential lookups go first
+app.add_middleware(admission.AdmissionMiddleware)
+# Outermost: the server span includes time spent queued by admission control
+app.add_middleware(tracing.TracingMiddleware)
+
+@app.exception_handler(OperationalError)
+async def database_deadline_exceeded(request: Request, exc: OperationalError):
+    # Statements cut off by their route class deadline; other errors stay 500s
+    if not deadlines.is_timeout(exc):
+        raise exc
+    return JSONResponse({"detail": "Database deadline exceeded"}, status_code=504)
+
 # Prefix all auth routes with /api/v1
 API_PREFIX = "/api/v1"
 
 # Protect Data/Auth Routes
-auth_deps = [Depends(security.verify_api_token)]
+auth_deps = [Depends(security.verify_api_token), Depends(audit.capture_actor), Depends(slow_queries.capture_route)]
 
 app.include_router(users.router, prefix=API_PREFIX, dependencies=auth_deps)
 app.include_router(groups.router, prefix=API_PREFIX, dependencies=auth_deps)
 app.include_router(policies.router, prefix=API_PREFIX, dependencies=auth_deps)
 app.include_router(credentials.router, prefix=API_PREFIX, dependencies=auth_deps)
+app.include_router(batch.router, prefix=API_PREFIX, dependencies=auth_deps)
+app.include_router(audit_log.router, prefix=API_PREFIX, dependencies=auth_deps)
+app.include_router(reports.router, prefix=API_PREFIX, dependencies=auth_deps)
+app.include_router(debug.router, prefix=API_PREFIX, dependencies=[Depends(security.verify_admin_token)])
 
 @app.get(f"{API_PREFIX}/healthcheck", tags=["healthCheck"], status_code=204)
 def healthcheck():
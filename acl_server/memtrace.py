@@ -0,0 +1,133 @@
+import os
+import sysconfig
+import threading
+import tracemalloc
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# tracemalloc snapshots for live workers.
+#
+# Allocation statistics are reported per allocation site (file:line) and
+# grouped by module: our own files relative to acl_server ("routers/users.py",
+# "models.py"), third-party code by distribution ("sqlalchemy", "pydantic"),
+# the standard library as "stdlib/<module>", anything else by file name.
+# Only the last
+# MAX_SNAPSHOTS snapshots are kept; each can hold tens of MB. Snapshots live in
+# the worker that took them, so their IDs ("<pid>-<n>") name that worker.
+
+MAX_SNAPSHOTS = 4
+
+_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_STDLIB = sysconfig.get_paths()["stdlib"] + os.sep
+_SITE_DIRS = (os.sep + "site-packages" + os.sep, os.sep + "dist-packages" + os.sep)
+
+_lock = threading.Lock()
+_snapshots: "OrderedDict[str, tracemalloc.Snapshot]" = OrderedDict()
+_next_id = 1
+
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+def module_of(filename: str) -> str:
+    if filename.startswith(_ROOT):
+        return filename[len(_ROOT):]
+    for site in _SITE_DIRS:
+        if site in filename:
+            package = filename.split(site, 1)[1].split(os.sep, 1)[0]
+            return package[:-3] if package.endswith(".py") else package
+    if filename.startswith(_STDLIB):
+        name = filename[len(_STDLIB):]
+        return "stdlib/" + (name[:-3] if name.endswith(".py") else name)
+    return os.path.basename(filename)
+
+def status() -> dict:
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_bytes": current,
+        "peak_bytes": peak,
+        "snapshots": list(_snapshots),
+    }
+
+def start(frames: int = 1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+def stop():
+    """Stops tracing and drops the stored snapshots."""
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+
+def owner(snapshot_id: str) -> Optional[int]:
+    """PID of the worker that took the snapshot, None for a malformed ID."""
+    pid, _, n = snapshot_id.partition("-")
+    return int(pid) if pid.isdigit() and n.isdigit() else None
+
+def snapshot() -> str:
+    global _next_id
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    snap = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    with _lock:
+        snapshot_id = f"{os.getpid()}-{_next_id}"
+        _next_id += 1
+        _snapshots[snapshot_id] = snap
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return snapshot_id
+
+def _get(snapshot_id: str) -> tracemalloc.Snapshot:
+    try:
+        return _snapshots[snapshot_id]
+    except KeyError:
+        raise KeyError(f"Snapshot {snapshot_id} not found in worker {os.getpid()}")
+
+def _site(stat) -> str:
+    frame = stat.traceback[0]
+    return f"{module_of(frame.filename)}:{frame.lineno}"
+
+def top(snapshot_id: str, limit: int = 20) -> dict:
+    snap = _get(snapshot_id)
+    modules: Dict[str, List[int]] = {}
+    for stat in snap.statistics("filename"):
+        totals = modules.setdefault(module_of(stat.traceback[0].filename), [0, 0])
+        totals[0] += stat.size
+        totals[1] += stat.count
+    return {
+        "snapshot": snapshot_id,
+        "modules": [
+            {"module": m, "size": size, "count": count}
+            for m, (size, count) in sorted(modules.items(), key=lambda kv: -kv[1][0])[:limit]
+        ],
+        "sites": [
+            {"site": _site(stat), "size": stat.size, "count": stat.count}
+            for stat in snap.statistics("lineno")[:limit]
+        ],
+    }
+
+def diff(base_id: str, target_id: str, limit: int = 20) -> dict:
+    base, target = _get(base_id), _get(target_id)
+    modules: Dict[str, List[int]] = {}
+    for stat in target.compare_to(base, "filename"):
+        totals = modules.setdefault(module_of(stat.traceback[0].filename), [0, 0])
+        totals[0] += stat.size_diff
+        totals[1] += stat.count_diff
+    return {
+        "base": base_id,
+        "target": target_id,
+        "modules": [
+            {"module": m, "size_diff": size, "count_diff": count}
+            for m, (size, count) in sorted(modules.items(), key=lambda kv: -abs(kv[1][0]))[:limit]
+            if size or count
+        ],
+        "sites": [
+            {"site": _site(stat), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+            for stat in target.compare_to(base, "lineno")[:limit]
+        ],
+    }
@@ -0,0 +1,182 @@
+from sqlalchemy import inspect, select, func, text, update, bindparam
+from sqlalchemy.engine import Connection, Engine
+from database import Base
+from models import SchemaVersion, AclState, AuditEvent, AccessKey, Policy, user_groups, group_policies, user_policies
+import json
+import statements
+import time
+
+# Versioned schema migrations.
+#
+# Each migration runs once per database, in order, and is recorded in
+# acl_schema_version. Migrations must be idempotent: a fresh database gets the
+# current schema from the baseline create_all, and the later steps then find
+# their indexes/constraints already present and do nothing.
+
+def _create_indexes(conn: Connection, names):
+    indexes = {i.name: i for t in Base.metadata.sorted_tables for i in t.indexes}
+    for name in names:
+        # Indexes replaced by a later migration are no longer in the models
+        if name in indexes:
+            indexes[name].create(bind=conn, checkfirst=True)
+
+def _add_columns(conn: Connection, table, names):
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        ddl = f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(dialect=conn.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+        conn.execute(text(ddl))
+
+def _baseline(conn: Connection):
+    Base.metadata.create_all(bind=conn)
+
+def _rebuild_sqlite_table(conn: Connection, table):
+    """
+    SQLite cannot alter constraints in place: recreates table from the model
+    (with its current constraints and indexes) and copies the rows over.
+    """
+    old = f"{table.name}__old"
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old}"))
+    # Index names are global; the new table recreates them
+    for index in inspect(conn).get_indexes(old):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+    table.create(bind=conn)
+
+    columns = ", ".join(c["name"] for c in inspect(conn).get_columns(old) if c["name"] in table.c)
+    # Rows pointing at deleted users/groups/policies cannot be copied with the constraints enforced
+    where = " AND ".join(
+        f"({fk.parent.name} IS NULL OR {fk.parent.name} IN (SELECT {fk.column.name} FROM {fk.column.table.name}))"
+        for fk in table.foreign_keys
+    )
+    conn.execute(text(f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old} WHERE {where}"))
+    conn.execute(text(f"DROP TABLE {old}"))
+
+def _missing_cascades(conn: Connection, table) -> list:
+    return [
+        fk for fk in inspect(conn).get_foreign_keys(table.name)
+        if (fk.get("options") or {}).get("ondelete", "").upper() != "CASCADE"
+    ]
+
+def _cascade_foreign_keys(conn: Connection):
+    # Deletes rely on the database cascading (the relationships use
+    # passive_deletes), so this migration must not be recorded without them
+    tables = (user_groups, group_policies, user_policies, AccessKey.__table__)
+    for table in tables:
+        missing = _missing_cascades(conn, table)
+        if missing and conn.dialect.name not in ("postgresql", "sqlite"):
+            raise RuntimeError(f"Cannot add ON DELETE CASCADE to {table.name} on {conn.dialect.name}")
+        if missing and conn.dialect.name == "sqlite":
+            _rebuild_sqlite_table(conn, table)
+            continue
+        for fk in missing:
+            columns = ", ".join(fk["constrained_columns"])
+            referred = ", ".join(fk["referred_columns"])
+            conn.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT "{fk["name"]}"'))
+            conn.execute(text(
+                f'ALTER TABLE {table.name} ADD CONSTRAINT "{fk["name"]}" '
+                f'FOREIGN KEY ({columns}) REFERENCES {fk["referred_table"]} ({referred}) ON DELETE CASCADE'
+            ))
+
+    for table in tables:
+        if _missing_cascades(conn, table):
+            raise RuntimeError(f"Foreign keys of {table.name} still lack ON DELETE CASCADE")
+
+def _performance_indexes(conn: Connection):
+    _create_indexes(conn, [
+        "ix_auth_credentials_user_id_key",
+        "ix_auth_user_groups_group_id_user_id",
+        "ix_auth_group_policies_policy_id_group_id",
+        "ix_auth_user_policies_policy_id_user_id",
+        "ix_auth_users_email",
+        "ix_auth_users_external_id",
+        "ix_auth_users_id_pattern",
+        "ix_auth_groups_id_pattern",
+        "ix_auth_policies_id_pattern",
+    ])
+
+def _state_table(conn: Connection):
+    AclState.__table__.create(bind=conn, checkfirst=True)
+
+def _credential_usage(conn: Connection):
+    _add_columns(conn, AccessKey.__table__, ["last_used_at", "use_count"])
+
+def _audit_table(conn: Connection):
+    AuditEvent.__table__.create(bind=conn, checkfirst=True)
+
+def _identity_indexes(conn: Connection):
+    conn.execute(text("DROP INDEX IF EXISTS ix_auth_users_email"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_auth_users_external_id"))
+    _create_indexes(conn, ["ix_auth_users_email_not_null", "ix_auth_users_external_id_not_null"])
+
+def _intern_statements(conn: Connection):
+    # Expand only: the inline statement column stays (and is still written) so
+    # replicas on the previous release keep working during a rolling update.
+    statements.policy_statements.create(bind=conn, checkfirst=True)
+    _add_columns(conn, Policy.__table__, ["statement_hashes"])
+    if "statement" not in {c["name"] for c in inspect(conn).get_columns(Policy.__tablename__)}:
+        return
+
+    # Copy the inline JSON into the shared statement table
+    rows = conn.execute(text("SELECT id, statement FROM auth_policies WHERE statement_hashes IS NULL")).all()
+    updates = []
+    for policy_id, statement in rows:
+        if statement is None:
+            continue
+        if isinstance(statement, str):
+            statement = json.loads(statement)
+        updates.append({"policy_id": policy_id, "hashes": statements.intern_all(statement)})
+    statements.store(conn, [h for u in updates for h in u["hashes"]])
+    if updates:
+        conn.execute(
+            update(Policy.__table__)
+            .where(Policy.__table__.c.id == bindparam("policy_id"))
+            .values(statement_hashes=bindparam("hashes")),
+            updates
+        )
+
+# (version, description, migration) - append only, never renumber
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "ON DELETE CASCADE foreign keys", _cascade_foreign_keys),
+    (3, "performance indexes", _performance_indexes),
+    (4, "acl_state table", _state_table),
+    (5, "credential usage tracking", _credential_usage),
+    (6, "audit log", _audit_table),
+    (7, "partial indexes for SSO user lookups", _identity_indexes),
+    (8, "content-addressed policy statements", _intern_statements),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn: Connection) -> int:
+    if not inspect(conn).has_table(SchemaVersion.__tablename__):
+        return 0
+    return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+def run_migrations(engine: Engine) -> int:
+    """
+    Brings the database schema up to SCHEMA_VERSION.
+    All pending migrations are applied in a single transaction.
+    """
+    with engine.begin() as conn:
+        SchemaVersion.__table__.create(bind=conn, checkfirst=True)
+        current = get_schema_version(conn)
+
+        for version, description, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Applying migration {version}: {description}")
+            migrate(conn)
+            conn.execute(SchemaVersion.__table__.insert().values(
+                version=version,
+                description=description,
+                applied_at=int(time.time())
+            ))
+
+    return SCHEMA_VERSION
@@ -1,26 +1,34 @@
 
-from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Table, Text, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Table, Text, JSON, Index, text, event
+from sqlalchemy.orm import Session, relationship, object_session
+from typing import List
 from database import Base
+import statements
 import time
 
 # Association Tables
 user_groups = Table('auth_user_groups', Base.metadata,
-    Column('user_id', String, ForeignKey('auth_users.id'), primary_key=True),
-    Column('group_id', String, ForeignKey('auth_groups.id'), primary_key=True),
-    Column('created_at', BigInteger, default=lambda: int(time.time()))
+    Column('user_id', String, ForeignKey('auth_users.id', ondelete='CASCADE'), primary_key=True),
+    Column('group_id', String, ForeignKey('auth_groups.id', ondelete='CASCADE'), primary_key=True),
+    Column('created_at', BigInteger, default=lambda: int(time.time())),
+    # Reverse of the primary key: members of a group
+    Index('ix_auth_user_groups_group_id_user_id', 'group_id', 'user_id')
 )
 
 group_policies = Table('auth_group_policies', Base.metadata,
-    Column('group_id', String, ForeignKey('auth_groups.id'), primary_key=True),
-    Column('policy_id', String, ForeignKey('auth_policies.id'), primary_key=True),
-    Column('created_at', BigInteger, default=lambda: int(time.time()))
+    Column('group_id', String, ForeignKey('auth_groups.id', ondelete='CASCADE'), primary_key=True),
+    Column('policy_id', String, ForeignKey('auth_policies.id', ondelete='CASCADE'), primary_key=True),
+    Column('created_at', BigInteger, default=lambda: int(time.time())),
+    # Reverse of the primary key: groups a policy is attached to
+    Index('ix_auth_group_policies_policy_id_group_id', 'policy_id', 'group_id')
 )
 
 user_policies = Table('auth_user_policies', Base.metadata,
-    Column('user_id', String, ForeignKey('auth_users.id'), primary_key=True),
-    Column('policy_id', String, ForeignKey('auth_policies.id'), primary_key=True),
-    Column('created_at', BigInteger, default=lambda: int(time.time()))
+    Column('user_id', String, ForeignKey('auth_users.id', ondelete='CASCADE'), primary_key=True),
+    Column('policy_id', String, ForeignKey('auth_policies.id', ondelete='CASCADE'), primary_key=True),
+    Column('created_at', BigInteger, default=lambda: int(time.time())),
+    # Reverse of the primary key: users a policy is attached to
+    Index('ix_auth_user_policies_policy_id_user_id', 'policy_id', 'user_id')
 )
 
 class User(Base):
@@ -34,9 +42,19 @@ class User(Base):
     external_id = Column(String, nullable=True)
     
     # Relationships
-    access_keys = relationship("AccessKey", back_populates="user")
-    groups = relationship("Group", secondary=user_groups, back_populates="users")
-    policies = relationship("Policy", secondary=user_policies, back_populates="users")
+    # passive_deletes: rows referencing a deleted user are removed by ON DELETE CASCADE,
+    # so deleting a user never loads its keys/memberships just to delete them one by one.
+    access_keys = relationship("AccessKey", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    groups = relationship("Group", secondary=user_groups, back_populates="users", passive_deletes=True)
+    policies = relationship("Policy", secondary=user_policies, back_populates="users", passive_deletes=True)
+
+    __table_args__ = (
+        # SSO lookups (list_users?email=/external_id=). Partial: most users have neither set.
+        Index("ix_auth_users_email_not_null", "email",
+              postgresql_where=text("email IS NOT NULL"), sqlite_where=text("email IS NOT NULL")),
+        Index("ix_auth_users_external_id_not_null", "external_id",
+              postgresql_where=text("external_id IS NOT NULL"), sqlite_where=text("external_id IS NOT NULL")),
+    )
 
 class Group(Base):
     __tablename__ = "auth_groups"
@@ -44,25 +62,103 @@ class Group(Base):
     description = Column(String, nullable=True)
     created_at = Column(BigInteger, default=lambda: int(time.time()))
     
-    users = relationship("User", secondary=user_groups, back_populates="groups")
-    policies = relationship("Policy", secondary=group_policies, back_populates="groups")
+    users = relationship("User", secondary=user_groups, back_populates="groups", passive_deletes=True)
+    policies = relationship("Policy", secondary=group_policies, back_populates="groups", passive_deletes=True)
 
 class Policy(Base):
     __tablename__ = "auth_policies"
     id = Column(String, primary_key=True, index=True)
     description = Column(String, nullable=True)
     created_at = Column(BigInteger, default=lambda: int(time.time()))
-    statement = Column(JSON) # Stores the policy JSON
+    statement_hashes = Column(JSON) # Ordered keys into auth_policy_statements, see statements.py
+    # Expand phase of the move to statement_hashes: the inline copy is still
+    # written, and read as the source of truth (see statements.current), since
+    # replicas running the previous release only read and write it. Dropped by
+    # a later migration once no such replica is left.
+    inline_statement = Column("statement", JSON)
     acl = Column(String, nullable=True)
     
-    groups = relationship("Group", secondary=group_policies, back_populates="policies")
-    users = relationship("User", secondary=user_policies, back_populates="policies")
+    groups = relationship("Group", secondary=group_policies, back_populates="policies", passive_deletes=True)
+    users = relationship("User", secondary=user_policies, back_populates="policies", passive_deletes=True)
+
+    @property
+    def current_hashes(self) -> List[str]:
+        return statements.current(self.statement_hashes, self.inline_statement)
+
+    @property
+    def statement(self):
+        """The policy's statements (shared, interned dicts: do not modify)."""
+        if self.inline_statement is not None:
+            return statements.resolve(None, self.current_hashes)
+        return statements.resolve(object_session(self), self.current_hashes)
+
+    @statement.setter
+    def statement(self, value):
+        hashes = statements.intern_all(value)
+        # Unchanged statements leave the row clean: no UPDATE is issued. Hashes
+        # left stale by a previous-release replica are rewritten.
+        if hashes != self.statement_hashes or hashes != self.current_hashes:
+            self.statement_hashes = hashes
+            self.inline_statement = statements.resolve(None, hashes)
+
+@event.listens_for(Session, "before_flush")
+def _store_policy_statements(session, flush_context, instances):
+    hashes = [
+        h for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, Policy) for h in obj.statement_hashes or []
+    ]
+    if hashes:
+        statements.store(session.connection(), hashes)
 
 class AccessKey(Base):
     __tablename__ = "auth_credentials"
     access_access_key_id = Column(String, primary_key=True)
     access_secret_access_key = Column(String) # Encrypted?
-    user_id = Column(String, ForeignKey("auth_users.id"))
+    user_id = Column(String, ForeignKey("auth_users.id", ondelete="CASCADE"))
     created_at = Column(BigInteger, default=lambda: int(time.time()))
+    # Maintained in batches by usage.UsageTracker, may lag behind by the flush interval
+    last_used_at = Column(BigInteger, nullable=True)
+    use_count = Column(BigInteger, nullable=False, default=0, server_default="0")
     
     user = relationship("User", back_populates="access_keys")
+
+    __table_args__ = (
+        # list_user_credentials: filter by user, prefix/order by key
+        Index("ix_auth_credentials_user_id_key", "user_id", "access_access_key_id"),
+    )
+
+class SchemaVersion(Base):
+    __tablename__ = "acl_schema_version"
+    version = Column(Integer, primary_key=True)
+    description = Column(String, nullable=True)
+    applied_at = Column(BigInteger, default=lambda: int(time.time()))
+
+class AuditEvent(Base):
+    __tablename__ = "acl_audit"
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    created_at = Column(BigInteger, nullable=False)
+    actor = Column(String, nullable=True)
+    action = Column(String, nullable=False) # API operation name, e.g. create_user
+    target_type = Column(String, nullable=False)
+    target_id = Column(String, nullable=False)
+    before = Column(JSON, nullable=True) # Only the fields that changed
+    after = Column(JSON, nullable=True)
+
+    __table_args__ = (
+        Index("ix_acl_audit_target", "target_type", "target_id", "id"),
+        Index("ix_acl_audit_actor", "actor", "id"),
+        Index("ix_acl_audit_created_at", "created_at"),
+    )
+
+class AclState(Base):
+    """Small key/value store for server bookkeeping (e.g. the seed fingerprint)."""
+    __tablename__ = "acl_state"
+    key = Column(String, primary_key=True)
+    value = Column(Text, nullable=True)
+    updated_at = Column(BigInteger, default=lambda: int(time.time()))
+
+# Prefix (startswith) filters only use a btree index under the C collation unless
+# the index is built with a pattern operator class. Postgres only.
+Index("ix_auth_users_id_pattern", User.id, postgresql_ops={"id": "varchar_pattern_ops"}).ddl_if(dialect="postgresql")
+Index("ix_auth_groups_id_pattern", Group.id, postgresql_ops={"id": "varchar_pattern_ops"}).ddl_if(dialect="postgresql")
+Index("ix_auth_policies_id_pattern", Policy.id, postgresql_ops={"id": "varchar_pattern_ops"}).ddl_if(dialect="postgresql")
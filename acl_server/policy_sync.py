@@ -0,0 +1,178 @@
+import json
+import os
+import time
+from typing import Dict, List
+import yaml
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+from models import Group, Policy, group_policies
+import audit
+import resource_index
+import shared_cache
+import statements
+
+# Policy-as-code: applies a directory of definitions to the database.
+#
+# Every *.json / *.yaml / *.yml file under the directory may contain
+#
+#   policies: [{"id": ..., "statement": [...], "acl": ...}, ...]   (like init_db.POLICIES_DATA)
+#   groups:   {"GroupId": ["PolicyId", ...], ...}                  (like init_db.GROUPS_DATA)
+#
+# Statements are compared by content hash (see statements.py). Current state
+# is read in three bulk queries and diffed in memory; only the
+# differences are written, in one transaction. Groups listed in the directory
+# are authoritative for their policy attachments. Policies missing from the
+# directory are only deleted with prune=True; groups are never deleted, since
+# they carry memberships.
+
+DEFAULT_ACL = "public"
+
+class SyncPlan:
+    def __init__(self):
+        self.create_policies: List[dict] = []
+        self.update_policies: List[dict] = []
+        self.delete_policies: List[str] = []
+        self.create_groups: List[str] = []
+        self.attach: List[tuple] = [] # (group_id, policy_id)
+        self.detach: List[tuple] = []
+
+    def is_empty(self) -> bool:
+        return not (self.create_policies or self.update_policies or self.delete_policies
+                    or self.create_groups or self.attach or self.detach)
+
+    def report(self) -> str:
+        lines = []
+        lines += [f"+ policy {p['id']}" for p in self.create_policies]
+        lines += [f"~ policy {p['id']}" for p in self.update_policies]
+        lines += [f"- policy {p}" for p in self.delete_policies]
+        lines += [f"+ group {g}" for g in self.create_groups]
+        lines += [f"+ attach {p} -> {g}" for g, p in self.attach]
+        lines += [f"- detach {p} -> {g}" for g, p in self.detach]
+        return "\n".join(lines) if lines else "No changes."
+
+def load_definitions(directory: str) -> dict:
+    """Merges all definition files under directory, in path order."""
+    policies: Dict[str, dict] = {}
+    groups: Dict[str, List[str]] = {}
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            with open(path) as f:
+                if name.endswith(".json"):
+                    data = json.load(f)
+                elif name.endswith((".yaml", ".yml")):
+                    data = yaml.safe_load(f)
+                else:
+                    continue
+            data = data or {}
+            for p in data.get("policies", []):
+                if p["id"] in policies:
+                    raise ValueError(f"Policy {p['id']} is defined twice ({path})")
+                hashes = statements.intern_all(p["statement"])
+                policies[p["id"]] = {
+                    "id": p["id"],
+                    "statement": statements.resolve(None, hashes),
+                    "statement_hashes": hashes,
+                    "acl": p.get("acl", DEFAULT_ACL),
+                }
+            for group_id, policy_ids in (data.get("groups") or {}).items():
+                if group_id in groups:
+                    raise ValueError(f"Group {group_id} is defined twice ({path})")
+                groups[group_id] = list(policy_ids)
+
+    for group_id, policy_ids in groups.items():
+        for policy_id in policy_ids:
+            if policy_id not in policies:
+                raise ValueError(f"Group {group_id} references undefined policy {policy_id}")
+    return {"policies": policies, "groups": groups}
+
+def plan(db: Session, definitions: dict, prune: bool = False) -> SyncPlan:
+    policies = definitions["policies"]
+    groups = definitions["groups"]
+    result = SyncPlan()
+
+    current_policies = {
+        pid: (statements.current(hashes, inline), acl)
+        for pid, hashes, inline, acl in db.execute(select(Policy.id, Policy.statement_hashes, Policy.inline_statement, Policy.acl))
+    }
+    current_groups = set(db.scalars(select(Group.id).where(Group.id.in_(list(groups)))))
+    current_links = set(db.execute(
+        select(group_policies.c.group_id, group_policies.c.policy_id)
+        .where(group_policies.c.group_id.in_(list(groups)))
+    ).tuples())
+
+    for policy_id, p in sorted(policies.items()):
+        if policy_id not in current_policies:
+            result.create_policies.append(p)
+        else:
+            hashes, acl = current_policies[policy_id]
+            if (hashes, acl) != (p["statement_hashes"], p["acl"]):
+                result.update_policies.append(dict(p, before={"statement": statements.resolve(db, hashes), "acl": acl}))
+    if prune:
+        result.delete_policies = sorted(set(current_policies) - set(policies))
+
+    result.create_groups = sorted(set(groups) - current_groups)
+    wanted_links = {(g, p) for g, policy_ids in groups.items() for p in policy_ids}
+    result.attach = sorted(wanted_links - current_links)
+    result.detach = sorted(current_links - wanted_links)
+    return result
+
+def apply(db: Session, sync_plan: SyncPlan):
+    """Writes the plan and commits. Caches are invalidated only if something changed."""
+    if sync_plan.is_empty():
+        return
+    now = int(time.time())
+
+    statements.store(db, [h for p in sync_plan.create_policies + sync_plan.update_policies for h in p["statement_hashes"]])
+    if sync_plan.create_policies:
+        db.execute(insert(Policy), [
+            {"id": p["id"], "statement_hashes": p["statement_hashes"], "inline_statement": p["statement"], "acl": p["acl"], "created_at": now}
+            for p in sync_plan.create_policies
+        ])
+    if sync_plan.update_policies:
+        db.execute(update(Policy), [
+            {"id": p["id"], "statement_hashes": p["statement_hashes"], "inline_statement": p["statement"], "acl": p["acl"]}
+            for p in sync_plan.update_policies
+        ])
+    if sync_plan.delete_policies:
+        db.execute(delete(Policy).where(Policy.id.in_(sync_plan.delete_policies)))
+    if sync_plan.create_groups:
+        db.execute(insert(Group), [
+            {"id": group_id, "description": f"Standard {group_id} group", "created_at": now}
+            for group_id in sync_plan.create_groups
+        ])
+    if sync_plan.detach:
+        db.execute(group_policies.delete().where(
+            tuple_(group_policies.c.group_id, group_policies.c.policy_id).in_(sync_plan.detach)
+        ))
+    if sync_plan.attach:
+        db.execute(group_policies.insert(), [
+            {"group_id": g, "policy_id": p, "created_at": now} for g, p in sync_plan.attach
+        ])
+
+    for p in sync_plan.create_policies:
+        audit.record(db, "create_policy", "policy", p["id"], after={"statement": p["statement"], "acl": p["acl"]})
+        resource_index.policy_changed(db, p["id"], p["statement_hashes"])
+    for p in sync_plan.update_policies:
+        audit.record(db, "update_policy", "policy", p["id"], before=p["before"], after={"statement": p["statement"], "acl": p["acl"]})
+        resource_index.policy_changed(db, p["id"], p["statement_hashes"])
+    for policy_id in sync_plan.delete_policies:
+        audit.record(db, "delete_policy", "policy", policy_id)
+        resource_index.policy_deleted(db, policy_id)
+    for group_id in sync_plan.create_groups:
+        audit.record(db, "create_group", "group", group_id, after={"description": f"Standard {group_id} group"})
+    for group_id, policy_id in sync_plan.attach:
+        audit.record(db, "attach_policy_to_group", "group", group_id, after={"policy": policy_id})
+    for group_id, policy_id in sync_plan.detach:
+        audit.record(db, "detach_policy_from_group", "group", group_id, before={"policy": policy_id})
+
+    if sync_plan.update_policies or sync_plan.delete_policies or sync_plan.attach or sync_plan.detach:
+        shared_cache.invalidate_all_policies(db)
+    db.commit()
+
+def sync(db: Session, directory: str, dry_run: bool = False, prune: bool = False) -> SyncPlan:
+    sync_plan = plan(db, load_definitions(directory), prune=prune)
+    if not dry_run:
+        apply(db, sync_plan)
+    return sync_plan
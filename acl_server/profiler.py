@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+
+# Sampling CPU profiler for live workers, standard library only.
+#
+# A sampler thread snapshots every other thread's stack with
+# sys._current_frames() at a fixed rate. Each sample is attributed to the
+# route whose endpoint function is on the stack (the route template, e.g.
+# /api/v1/auth/users/{userId}) and counted by its collapsed stack, the input
+# format of flamegraph.pl / speedscope:
+#
+#   <route>;<outermost frame>;...;<innermost frame> <count>
+#
+# Threads that are not serving a route (idle pool threads, background tasks)
+# are reported under "(no route)".
+
+DEFAULT_HZ = int(os.getenv("ACL_PROFILE_HZ", "100"))
+
+NO_ROUTE = "(no route)"
+
+# Only one profile per worker at a time
+busy = threading.Lock()
+
+_labels: Dict[object, str] = {}
+
+def _label(code) -> str:
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+def sample(seconds: float, hz: int, route_codes: Dict[object, str]) -> Counter:
+    """Samples all other threads for `seconds`; route_codes maps endpoint code objects to route templates."""
+    me = threading.get_ident()
+    interval = 1.0 / hz
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            labels = []
+            route = None
+            while frame is not None:
+                code = frame.f_code
+                if code in route_codes:
+                    route = route_codes[code]
+                labels.append(_label(code))
+                frame = frame.f_back
+            labels.append(route or NO_ROUTE)
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return stacks
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
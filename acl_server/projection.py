@@ -0,0 +1,85 @@
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from models import User, Group, Policy
+from schemas import Statement
+
+# Field projection for list endpoints (?fields=username,email).
+#
+# Each list maps its API field names to model columns. With fields set, the
+# lists read from SQL select only those columns (plus the pagination key);
+# effective policies, whose IDs come from the shared cache, are the exception
+# and are loaded whole. Every list serializes only the requested fields,
+# bypassing the response model, so policy statements are only read and
+# validated when "statement" is requested.
+
+USER_FIELDS = {
+    "username": User.id,
+    "creation_date": User.created_at,
+    "friendly_name": User.friendly_name,
+    "email": User.email,
+    "source": User.source,
+    "encryptedPassword": User.encrypted_password,
+    "external_id": User.external_id,
+}
+
+GROUP_FIELDS = {
+    "id": Group.id,
+    "name": Group.id,
+    "description": Group.description,
+    "creation_date": Group.created_at,
+}
+
+POLICY_FIELDS = {
+    "name": Policy.id,
+    "creation_date": Policy.created_at,
+    "statement": Policy.inline_statement, # source of truth until it is dropped, see models.py
+    "acl": Policy.acl,
+}
+
+def parse(fields: Optional[str], available: Dict) -> Optional[List[str]]:
+    """Requested field names in order, or None for the full representation."""
+    if fields is None:
+        return None
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [n for n in names if n not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}")
+    return names
+
+def columns(names: List[str], available: Dict, key) -> list:
+    """Distinct columns to select for names, the pagination key first."""
+    selected = {key.key: key}
+    for name in names:
+        selected.setdefault(available[name].key, available[name])
+    return list(selected.values())
+
+def page(db: Session, items: list, names: List[str], available: Dict, key, amount: int) -> JSONResponse:
+    """
+    A list response for up to amount + 1 items, which may be ORM objects or
+    rows selected with columns(): both expose the columns as attributes.
+    """
+    has_more = len(items) > amount
+    items = items[:amount]
+
+    results = []
+    for item in items:
+        result = {}
+        for name in names:
+            value = getattr(item, available[name].key)
+            if available[name] is Policy.inline_statement:
+                # Same shape as the full representation
+                value = [Statement.model_validate(s).model_dump() for s in value or []]
+            result[name] = value
+        results.append(result)
+
+    return JSONResponse({
+        "pagination": {
+            "has_more": has_more,
+            "max_per_page": amount,
+            "results": len(items),
+            "next_offset": getattr(items[-1], key.key) if items else "",
+        },
+        "results": results,
+    })
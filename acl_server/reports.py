@@ -0,0 +1,107 @@
+import csv
+import io
+from typing import Dict, Iterator, List, Tuple
+from sqlalchemy.orm import Session
+from logic import wildcard_match
+from ttl_cache import TTLCache
+from models import User, Policy, user_policies, group_policies, user_groups
+import statements
+
+# Access matrix report: one row per user, one column per (action, resource
+# pattern) that appears in any policy statement. A cell is "allow" or "deny"
+# if one of the user's effective policies (see logic.get_effective_policies)
+# has a statement covering that column, deny winning, and empty otherwise.
+#
+# Each distinct statement is evaluated against the columns once, and each
+# policy's and group's combined effects are computed once; users are then
+# streamed in batches and their rows assembled from those precomputed sets.
+# Users with the same direct policies and groups share a row, through an LRU of
+# ROW_CACHE_SIZE rows so memory stays bounded however many combinations exist.
+
+BATCH_SIZE = 1000
+ROW_CACHE_SIZE = 10000
+
+Effects = Dict[int, str] # column index -> "allow" / "deny"
+
+def _merge(into: Effects, effects: Effects):
+    for column, effect in effects.items():
+        if into.get(column) != "deny":
+            into[column] = effect
+
+def _columns(statement_hashes) -> List[Tuple[str, str]]:
+    columns = set()
+    for h in statement_hashes:
+        _, actions, resources = statements.parsed(h)
+        columns.update((a, r) for a in actions for r in resources)
+    return sorted(columns)
+
+def _statement_effects(statement_hash: str, columns: List[Tuple[str, str]]) -> Effects:
+    """Columns covered by a statement: its patterns match the column's patterns as text."""
+    effect, actions, resources = statements.parsed(statement_hash)
+    return {
+        i: effect for i, (action, resource) in enumerate(columns)
+        if any(wildcard_match(r, resource) for r in resources) and any(wildcard_match(a, action) for a in actions)
+    }
+
+def access_matrix(db: Session, batch_size: int = BATCH_SIZE, row_cache_size: int = ROW_CACHE_SIZE) -> Iterator[List[str]]:
+    """Yields the header row, then one row per user ordered by user ID."""
+    policies = [
+        (policy_id, statements.current(hashes, inline))
+        for policy_id, hashes, inline in db.query(Policy.id, Policy.statement_hashes, Policy.inline_statement)
+    ]
+    distinct = {h for _, hashes in policies for h in hashes}
+    statements.load(db, distinct)
+    columns = _columns(distinct)
+    yield ["user"] + [f"{action} {resource}" for action, resource in columns]
+
+    effects_by_statement = {h: _statement_effects(h, columns) for h in distinct}
+    policy_effects: Dict[str, Effects] = {}
+    for policy_id, hashes in policies:
+        effects = policy_effects[policy_id] = {}
+        for h in hashes:
+            _merge(effects, effects_by_statement[h])
+
+    group_effects: Dict[str, Effects] = {}
+    for group_id, policy_id in db.query(group_policies.c.group_id, group_policies.c.policy_id):
+        _merge(group_effects.setdefault(group_id, {}), policy_effects[policy_id])
+
+    rows = TTLCache(row_cache_size, ttl=float("inf")) # (direct policies, groups) -> row
+    after = ""
+    while True:
+        user_ids = [u for (u,) in db.query(User.id).filter(User.id > after).order_by(User.id).limit(batch_size)]
+        if not user_ids:
+            return
+        after = user_ids[-1]
+
+        direct = {u: set() for u in user_ids}
+        for user_id, policy_id in db.query(user_policies.c.user_id, user_policies.c.policy_id).filter(user_policies.c.user_id.in_(user_ids)):
+            direct[user_id].add(policy_id)
+        groups = {u: set() for u in user_ids}
+        for user_id, group_id in db.query(user_groups.c.user_id, user_groups.c.group_id).filter(user_groups.c.user_id.in_(user_ids)):
+            groups[user_id].add(group_id)
+
+        for user_id in user_ids:
+            key = (frozenset(direct[user_id]), frozenset(groups[user_id]))
+            row = rows.get(key)
+            if row is None:
+                effects: Effects = {}
+                for group_id in key[1]:
+                    _merge(effects, group_effects.get(group_id, {}))
+                for policy_id in key[0]:
+                    _merge(effects, policy_effects[policy_id])
+                row = [effects.get(i, "") for i in range(len(columns))]
+                rows.set(key, row)
+            yield [user_id] + row
+
+def access_matrix_csv(db: Session, batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    """access_matrix as CSV text, one chunk per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for n, row in enumerate(access_matrix(db, batch_size)):
+        writer.writerow(row)
+        if n % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
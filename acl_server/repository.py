@@ -0,0 +1,72 @@
+from typing import List, Optional
+from sqlalchemy import bindparam, select, union
+from sqlalchemy.orm import Session
+from models import AccessKey, Group, Policy, User, user_groups, user_policies, group_policies
+import statements
+
+# Hot-path lookups.
+#
+# The statements are built once at import time with bind parameters, so a
+# request only binds values: SQLAlchemy memoizes the cache key of a statement
+# object and finds its compiled form in the engine's compiled cache, instead of
+# constructing, hashing and compiling a new Query every call. Routers use these
+# rather than db.query(...).filter(...) for lookups by key.
+
+_user_by_id = select(User).where(User.id == bindparam("id"))
+_user_exists = select(User.id).where(User.id == bindparam("id"))
+_group_by_id = select(Group).where(Group.id == bindparam("id"))
+_policy_by_id = select(Policy).where(Policy.id == bindparam("id"))
+_policies_by_id = select(Policy).where(Policy.id.in_(bindparam("ids", expanding=True)))
+_access_key_by_id = select(AccessKey).where(AccessKey.access_access_key_id == bindparam("id"))
+_user_access_key = select(AccessKey).where(
+    AccessKey.access_access_key_id == bindparam("id"),
+    AccessKey.user_id == bindparam("user_id"),
+)
+
+# Key, owner and group memberships (one row per group)
+_access_key_bundle = (
+    select(AccessKey, User, user_groups.c.group_id)
+    .join(User, User.id == AccessKey.user_id)
+    .outerjoin(user_groups, user_groups.c.user_id == User.id)
+    .where(AccessKey.access_access_key_id == bindparam("id"))
+    .order_by(user_groups.c.group_id)
+)
+
+_effective_policy_ids = union(
+    select(user_policies.c.policy_id).where(user_policies.c.user_id == bindparam("user_id")),
+    select(group_policies.c.policy_id)
+    .join(user_groups, user_groups.c.group_id == group_policies.c.group_id)
+    .where(user_groups.c.user_id == bindparam("user_id")),
+)
+_effective_policies = select(Policy).where(Policy.id.in_(_effective_policy_ids)).order_by(Policy.id)
+
+def get_user(db: Session, user_id: str) -> Optional[User]:
+    return db.execute(_user_by_id, {"id": user_id}).scalar_one_or_none()
+
+def user_exists(db: Session, user_id: str) -> bool:
+    return db.execute(_user_exists, {"id": user_id}).first() is not None
+
+def get_group(db: Session, group_id: str) -> Optional[Group]:
+    return db.execute(_group_by_id, {"id": group_id}).scalar_one_or_none()
+
+def get_policy(db: Session, policy_id: str) -> Optional[Policy]:
+    return db.execute(_policy_by_id, {"id": policy_id}).scalar_one_or_none()
+
+def get_policies(db: Session, policy_ids: List[str]) -> List[Policy]:
+    return list(db.execute(_policies_by_id, {"ids": list(policy_ids)}).scalars())
+
+def get_access_key(db: Session, access_key_id: str) -> Optional[AccessKey]:
+    return db.execute(_access_key_by_id, {"id": access_key_id}).scalar_one_or_none()
+
+def get_user_access_key(db: Session, user_id: str, access_key_id: str) -> Optional[AccessKey]:
+    return db.execute(_user_access_key, {"id": access_key_id, "user_id": user_id}).scalar_one_or_none()
+
+def get_access_key_bundle(db: Session, access_key_id: str) -> list:
+    """[(AccessKey, User, group_id or None), ...], empty if the key does not exist."""
+    return db.execute(_access_key_bundle, {"id": access_key_id}).all()
+
+def get_effective_policies(db: Session, user_id: str) -> List[Policy]:
+    """A user's direct and group policies, by ID, with their statements loaded."""
+    policies = list(db.execute(_effective_policies, {"user_id": user_id}).scalars())
+    statements.load(db, [h for p in policies for h in p.statement_hashes or []])
+    return policies
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy.orm import Session
+from database import on_commit
+from logic import wildcard_match
+from models import Policy
+import statements
+
+# Reverse index over policy statements: "which policies mention this resource".
+#
+# Every statement is filed under the literal part of its resource pattern, i.e.
+# everything before the first wildcard ("arn:lakefs:fs:::repository/foo/*" is
+# filed under "arn:lakefs:fs:::repository/foo/", "*" under ""). A statement can
+# only match resources that start with its bucket key, so a lookup probes the
+# buckets for every prefix of the requested resource and evaluates just those
+# statements. Entries share the interned parsed form of their statement.
+#
+# Each worker keeps its own index. Policy changes made through this worker are
+# applied incrementally once they commit; changes made elsewhere are picked up
+# by a full rebuild once the index is older than INDEX_TTL seconds.
+
+INDEX_TTL = float(os.getenv("ACL_RESOURCE_INDEX_TTL", "30"))
+
+class _Entry:
+    __slots__ = ("policy_id", "effect", "resource", "actions")
+
+    def __init__(self, policy_id: str, effect: str, resource: str, actions: List[str]):
+        self.policy_id = policy_id
+        self.effect = effect
+        self.resource = resource
+        self.actions = actions
+
+def literal_prefix(pattern: str) -> str:
+    for i, c in enumerate(pattern):
+        if c in "*?":
+            return pattern[:i]
+    return pattern
+
+def _entries(policy_id: str, statement_hashes: Optional[list]) -> Iterable[_Entry]:
+    for h in statement_hashes or []:
+        effect, actions, resources = statements.parsed(h)
+        for resource in resources:
+            yield _Entry(policy_id, effect, resource, actions)
+
+class ResourceIndex:
+    def __init__(self, ttl: float = INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, List[_Entry]] = defaultdict(list)
+        self._by_policy: Dict[str, List[_Entry]] = {}
+        self._built_at: Optional[float] = None
+
+    def _remove(self, policy_id: str):
+        for entry in self._by_policy.pop(policy_id, []):
+            key = literal_prefix(entry.resource)
+            self._buckets[key].remove(entry)
+            if not self._buckets[key]:
+                del self._buckets[key]
+
+    def _add(self, policy_id: str, statement_hashes: Optional[list]):
+        entries = list(_entries(policy_id, statement_hashes))
+        self._by_policy[policy_id] = entries
+        for entry in entries:
+            self._buckets[literal_prefix(entry.resource)].append(entry)
+
+    def put(self, policy_id: str, statement_hashes: Optional[list]):
+        """statement_hashes must be interned (statements.intern_all / statements.load)."""
+        with self._lock:
+            self._remove(policy_id)
+            self._add(policy_id, statement_hashes)
+
+    def remove(self, policy_id: str):
+        with self._lock:
+            self._remove(policy_id)
+
+    def rebuild(self, db: Session):
+        rows = [
+            (policy_id, statements.current(hashes, inline))
+            for policy_id, hashes, inline in db.query(Policy.id, Policy.statement_hashes, Policy.inline_statement)
+        ]
+        statements.load(db, [h for _, hashes in rows for h in hashes])
+        with self._lock:
+            self._buckets.clear()
+            self._by_policy.clear()
+            for policy_id, hashes in rows:
+                self._add(policy_id, hashes)
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        """Forces a full rebuild on next use."""
+        self._built_at = None
+
+    def ensure_fresh(self, db: Session):
+        if self._built_at is None or time.monotonic() - self._built_at > self.ttl:
+            self.rebuild(db)
+
+    def match(self, action: str, resource: str) -> Dict[str, Set[str]]:
+        """Policy ID -> effects ("allow"/"deny") of its statements matching action on resource."""
+        matches: Dict[str, Set[str]] = defaultdict(set)
+        with self._lock:
+            for end in range(len(resource) + 1):
+                for entry in self._buckets.get(resource[:end], ()):
+                    if not wildcard_match(entry.resource, resource):
+                        continue
+                    if any(wildcard_match(a, action) for a in entry.actions):
+                        matches[entry.policy_id].add(entry.effect)
+        return dict(matches)
+
+index = ResourceIndex()
+
+# --- Incremental maintenance (applied once the mutating transaction commits) ---
+
+def policy_changed(db: Session, policy_id: str, statement_hashes: Optional[list]):
+    on_commit(db, lambda: index.put(policy_id, statement_hashes))
+
+def policy_deleted(db: Session, policy_id: str):
+    on_commit(db, lambda: index.remove(policy_id))
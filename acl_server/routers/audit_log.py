@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from database import get_db
+from models import AuditEvent
+from schemas import AuditEvent as AuditEventSchema, AuditEventList, AuditStats
+from typing import Optional
+import audit
+
+router = APIRouter(prefix="/audit", tags=["audit"])
+
+@router.get("", response_model=AuditEventList)
+def list_audit_events(
+    after: str = "",
+    amount: int = 100,
+    actor: Optional[str] = None,
+    action: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    # Keyset pagination on the event ID (insertion order)
+    query = db.query(AuditEvent)
+    if actor:
+        query = query.filter(AuditEvent.actor == actor)
+    if action:
+        query = query.filter(AuditEvent.action == action)
+    if target_type:
+        query = query.filter(AuditEvent.target_type == target_type)
+    if target_id:
+        query = query.filter(AuditEvent.target_id == target_id)
+    if since is not None:
+        query = query.filter(AuditEvent.created_at >= since)
+    if until is not None:
+        query = query.filter(AuditEvent.created_at < until)
+
+    if after:
+        if not after.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid 'after' offset")
+        query = query.filter(AuditEvent.id > int(after))
+
+    query = query.order_by(AuditEvent.id)
+
+    results = query.limit(amount + 1).all()
+    has_more = len(results) > amount
+    results = results[:amount]
+    next_offset = str(results[-1].id) if results else ""
+
+    return {
+        "pagination": {
+            "has_more": has_more,
+            "max_per_page": amount,
+            "results": len(results),
+            "next_offset": next_offset
+        },
+        "results": [
+            AuditEventSchema(
+                id=e.id,
+                created_at=e.created_at,
+                actor=e.actor,
+                action=e.action,
+                target_type=e.target_type,
+                target_id=e.target_id,
+                before=e.before,
+                after=e.after
+            ) for e in results
+        ]
+    }
+
+@router.get("/stats", response_model=AuditStats)
+def get_audit_stats():
+    """Writer queue metrics: events dropped because the queue was full show up here."""
+    return AuditStats(queued=audit.writer.queued(), **audit.writer.stats)
@@ -0,0 +1,110 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+from database import get_db
+from schemas import (
+    BatchOperation, BatchRequest, BatchResponse, BatchResult,
+    UserCreation, UserPassword, GroupCreation, Policy as PolicySchema, CredentialsCreation
+)
+from routers import users, groups, policies, credentials
+
+router = APIRouter(prefix="/auth", tags=["auth"])
+
+class _BatchSession:
+    """
+    Wraps the request session so the router functions can be reused as-is.
+    Their per-call commit() becomes a flush(): every operation sees the
+    previous ones, and the batch endpoint commits once at the end.
+    """
+    def __init__(self, db: Session):
+        self._db = db
+
+    def commit(self):
+        self._db.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+def _path(op: BatchOperation, name: str) -> str:
+    if name not in op.path:
+        raise HTTPException(status_code=400, detail=f"Missing path parameter '{name}'")
+    return op.path[name]
+
+def _body(op: BatchOperation, model):
+    return model.model_validate(op.body or {})
+
+# op name -> (status code of the equivalent REST call, handler)
+OPERATIONS = {
+    # Users
+    "create_user": (status.HTTP_201_CREATED, lambda op, db: users.create_user(_body(op, UserCreation), db=db)),
+    "delete_user": (status.HTTP_204_NO_CONTENT, lambda op, db: users.delete_user(_path(op, "userId"), db=db)),
+    "update_user_password": (status.HTTP_200_OK, lambda op, db: users.update_user_password(
+        _path(op, "userId"), _body(op, UserPassword), db=db)),
+    "update_user_friendly_name": (status.HTTP_204_NO_CONTENT, lambda op, db: users.update_user_friendly_name(
+        _path(op, "userId"), op.body or {}, db=db)),
+    # Groups
+    "create_group": (status.HTTP_201_CREATED, lambda op, db: groups.create_group(_body(op, GroupCreation), db=db)),
+    "delete_group": (status.HTTP_204_NO_CONTENT, lambda op, db: groups.delete_group(_path(op, "groupId"), db=db)),
+    "add_group_membership": (status.HTTP_201_CREATED, lambda op, db: groups.add_group_membership(
+        _path(op, "groupId"), _path(op, "userId"), db=db)),
+    "delete_group_membership": (status.HTTP_204_NO_CONTENT, lambda op, db: groups.delete_group_membership(
+        _path(op, "groupId"), _path(op, "userId"), db=db)),
+    "attach_policy_to_group": (status.HTTP_201_CREATED, lambda op, db: groups.attach_policy_to_group(
+        _path(op, "groupId"), _path(op, "policyId"), db=db)),
+    "detach_policy_from_group": (status.HTTP_204_NO_CONTENT, lambda op, db: groups.detach_policy_from_group(
+        _path(op, "groupId"), _path(op, "policyId"), db=db)),
+    # Policies
+    "create_policy": (status.HTTP_201_CREATED, lambda op, db: policies.create_policy(_body(op, PolicySchema), db=db)),
+    "update_policy": (status.HTTP_200_OK, lambda op, db: policies.update_policy(
+        _path(op, "policyId"), _body(op, PolicySchema), db=db)),
+    "delete_policy": (status.HTTP_204_NO_CONTENT, lambda op, db: policies.delete_policy(_path(op, "policyId"), db=db)),
+    "attach_policy_to_user": (status.HTTP_201_CREATED, lambda op, db: policies.attach_policy_to_user(
+        _path(op, "userId"), _path(op, "policyId"), db=db)),
+    "detach_policy_from_user": (status.HTTP_204_NO_CONTENT, lambda op, db: policies.detach_policy_from_user(
+        _path(op, "userId"), _path(op, "policyId"), db=db)),
+    # Credentials
+    "create_credentials": (status.HTTP_201_CREATED, lambda op, db: credentials.create_credentials(
+        _path(op, "userId"), _body(op, CredentialsCreation), access_key=None, secret_key=None, db=db)),
+    "delete_credentials": (status.HTTP_204_NO_CONTENT, lambda op, db: credentials.delete_credentials(
+        _path(op, "userId"), _path(op, "accessKeyId"), db=db)),
+}
+
+def _to_result(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, Response):
+        return None
+    return value
+
+@router.post("/batch", response_model=BatchResponse)
+def run_batch(batch: BatchRequest, db: Session = Depends(get_db)):
+    """
+    Runs an ordered list of ACL mutations in a single transaction.
+    Either every operation is applied or none is; on failure the error
+    reports the index of the operation that failed.
+    """
+    for index, op in enumerate(batch.operations):
+        if op.op not in OPERATIONS:
+            raise HTTPException(status_code=400, detail={"index": index, "op": op.op, "message": "Unknown operation"})
+
+    batch_db = _BatchSession(db)
+    results = []
+
+    for index, op in enumerate(batch.operations):
+        status_code, handler = OPERATIONS[op.op]
+        try:
+            value = handler(op, batch_db)
+        except HTTPException as e:
+            db.rollback()
+            raise HTTPException(status_code=e.status_code, detail={"index": index, "op": op.op, "message": e.detail})
+        except ValidationError as e:
+            db.rollback()
+            raise HTTPException(status_code=422, detail={"index": index, "op": op.op, "message": e.errors(include_url=False, include_context=False)})
+        except Exception:
+            db.rollback()
+            raise
+
+        results.append(BatchResult(op=op.op, status=status_code, result=_to_result(value)))
+
+    db.commit()
+    return {"results": results}
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from database import get_db
-from models import AccessKey, User
-from schemas import Credentials, CredentialsList, CredentialsWithSecret, Pagination, CredentialsCreation
+from models import AccessKey
+from schemas import Credentials, CredentialsList, CredentialsWithSecret, Pagination, CredentialsCreation, AuthBundle, User as UserSchema, Policy as PolicySchema
 from typing import List, Optional
 import time
 import secrets
 import string
 import security
+import shared_cache
+import usage
+import audit
+import repository
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -21,23 +25,82 @@ def generate_secret_key():
 
 @router.get("/credentials/{accessKeyId}", response_model=CredentialsWithSecret)
 def get_credentials(accessKeyId: str, db: Session = Depends(get_db)):
-    cred = db.query(AccessKey).filter(AccessKey.access_access_key_id == accessKeyId).first()
-    if not cred:
-        raise HTTPException(status_code=404, detail="Credentials not found")
+    # Hot path for lakeFS authentication: served from the cross-worker cache when possible
+    cached = shared_cache.credentials.get(accessKeyId)
+    if cached is None:
+        version = shared_cache.credentials.version()
+        cred = repository.get_access_key(db, accessKeyId)
+        if not cred:
+            raise HTTPException(status_code=404, detail="Credentials not found")
+        cached = {"user_id": cred.user_id, "secret": cred.access_secret_access_key, "created_at": cred.created_at}
+        shared_cache.credentials.set(accessKeyId, cached, version=version)
+
+    usage.tracker.record(accessKeyId)
         
     # Decrypt the secret key before returning
     try:
-        decrypted_secret = security.decrypt_secret(cred.access_secret_access_key)
+        decrypted_secret = security.decrypt_secret(cached["secret"])
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to decrypt credentials")
 
     # Note: user_name required by spec, maps to user_id (which is username in our model)
     return CredentialsWithSecret(
-        access_key_id=cred.access_access_key_id,
+        access_key_id=accessKeyId,
         secret_access_key=decrypted_secret,
-        creation_date=cred.created_at,
+        creation_date=cached["created_at"],
         user_id=1, # Dummy ID for deprecated integer field
-        user_name=cred.user_id 
+        user_name=cached["user_id"]
+    )
+
+@router.get("/credentials/{accessKeyId}/bundle", response_model=AuthBundle)
+def get_credentials_bundle(accessKeyId: str, db: Session = Depends(get_db)):
+    """
+    get_credentials + get_user + list_user_policies(effective=True) in one call,
+    for gateways that authenticate and authorize each request themselves.
+    """
+    # Query 1: key, owner and group memberships (one row per group)
+    rows = repository.get_access_key_bundle(db, accessKeyId)
+    if not rows:
+        raise HTTPException(status_code=404, detail="Credentials not found")
+    cred, user, _ = rows[0]
+    group_ids = [group_id for _, _, group_id in rows if group_id is not None]
+
+    # Query 2: effective policies (their statements are usually interned already)
+    policies = repository.get_effective_policies(db, user.id)
+
+    usage.tracker.record(accessKeyId)
+
+    try:
+        decrypted_secret = security.decrypt_secret(cred.access_secret_access_key)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to decrypt credentials")
+
+    return AuthBundle(
+        credentials=CredentialsWithSecret(
+            access_key_id=accessKeyId,
+            secret_access_key=decrypted_secret,
+            creation_date=cred.created_at,
+            user_id=1, # Dummy ID for deprecated integer field
+            user_name=user.id
+        ),
+        user=UserSchema(
+            username=user.id,
+            creation_date=user.created_at,
+            friendly_name=user.friendly_name,
+            email=user.email,
+            source=user.source,
+            encryptedPassword=user.encrypted_password,
+            external_id=user.external_id
+        ),
+        groups=group_ids,
+        policies=[
+            PolicySchema(
+                name=p.id,
+                creation_date=p.created_at,
+                statement=p.statement or [],
+                acl=p.acl
+            ) for p in policies
+        ]
     )
 
 @router.get("/users/{userId}/credentials", response_model=CredentialsList)
@@ -48,7 +111,7 @@ def list_user_credentials(
     amount: int = 100,
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
@@ -76,7 +139,9 @@ def list_user_credentials(
         "results": [
             Credentials(
                 access_key_id=c.access_access_key_id,
-                creation_date=c.created_at
+                creation_date=c.created_at,
+                last_used_date=c.last_used_at,
+                use_count=c.use_count or 0
             ) for c in results
         ]
     }
@@ -89,7 +154,7 @@ def create_credentials(
     secret_key: Optional[str] = Query(None),
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
@@ -107,7 +172,7 @@ def create_credentials(
     # Encrypt the secret before storing
     encrypted_sk = security.encrypt_secret(sk)
     
-    if db.query(AccessKey).filter(AccessKey.access_access_key_id == ak).first():
+    if repository.get_access_key(db, ak):
         raise HTTPException(status_code=409, detail="Access Key already exists")
 
     new_cred = AccessKey(
@@ -117,6 +182,7 @@ def create_credentials(
         created_at=int(time.time())
     )
     db.add(new_cred)
+    audit.record(db, "create_credentials", "credentials", ak, after={"user": userId})
     db.commit()
     db.refresh(new_cred)
     
@@ -134,21 +200,25 @@ from fastapi import Response
 def delete_credentials(userId: str, accessKeyId: str, db: Session = Depends(get_db)):
     # Spec says check userId and accessKeyId match?
     # Usually yes.
-    cred = db.query(AccessKey).filter(AccessKey.access_access_key_id == accessKeyId, AccessKey.user_id == userId).first()
+    cred = repository.get_user_access_key(db, userId, accessKeyId)
     if not cred:
          raise HTTPException(status_code=404, detail="Credentials not found")
          
+    audit.record(db, "delete_credentials", "credentials", accessKeyId, before={"user": userId})
     db.delete(cred)
+    shared_cache.invalidate_credentials(db, accessKeyId)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.get("/users/{userId}/credentials/{accessKeyId}", response_model=Credentials)
 def get_credentials_for_user(userId: str, accessKeyId: str, db: Session = Depends(get_db)):
-    cred = db.query(AccessKey).filter(AccessKey.access_access_key_id == accessKeyId, AccessKey.user_id == userId).first()
+    cred = repository.get_user_access_key(db, userId, accessKeyId)
     if not cred:
         raise HTTPException(status_code=404, detail="Credentials not found")
     
     return Credentials(
         access_key_id=cred.access_access_key_id,
-        creation_date=cred.created_at
+        creation_date=cred.created_at,
+        last_used_date=cred.last_used_at,
+        use_count=cred.use_count or 0
     )
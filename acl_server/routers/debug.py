@@ -0,0 +1,121 @@
+import os
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+import memtrace
+import profiler
+import slow_queries
+
+# Diagnostics for live workers. Mounted with the admin token dependency, and
+# exempt from admission control so they still answer when a worker is saturated.
+# Each request is served by (and reports on) a single worker process, named in
+# the X-Worker-Pid header of every response, errors included. With ACL_WORKERS > 1
+# the kernel picks the worker, so state kept between requests (tracemalloc and
+# its snapshots) is per worker: see "Profiling Live Workers" in the README.
+
+class _WorkerRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def worker_handler(request: Request) -> Response:
+            try:
+                response = await handler(request)
+            except HTTPException as e:
+                response = await http_exception_handler(request, e)
+            except RequestValidationError as e:
+                response = await request_validation_exception_handler(request, e)
+            response.headers["X-Worker-Pid"] = str(os.getpid())
+            return response
+
+        return worker_handler
+
+router = APIRouter(prefix="/debug", tags=["debug"], route_class=_WorkerRoute)
+
+def _route_codes(request: Request) -> dict:
+    return {
+        route.endpoint.__code__: route.path
+        for route in request.app.routes
+        if isinstance(route, APIRoute) and hasattr(route.endpoint, "__code__")
+    }
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(
+    request: Request,
+    seconds: float = Query(10, gt=0, le=120),
+    hz: int = Query(profiler.DEFAULT_HZ, ge=1, le=1000),
+):
+    """Samples this worker's threads for `seconds`; returns collapsed stacks per route template."""
+    if not profiler.busy.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    try:
+        stacks = await run_in_threadpool(profiler.sample, seconds, hz, _route_codes(request))
+    finally:
+        profiler.busy.release()
+    return PlainTextResponse(profiler.collapsed(stacks))
+
+# --- Memory (tracemalloc) ---
+
+@router.get("/memory")
+def memory_status():
+    return memtrace.status()
+
+@router.post("/memory/start")
+def memory_start(frames: int = Query(1, ge=1, le=50)):
+    """Starts tracing allocations; costs CPU and memory until stopped. frames > 1 records deeper tracebacks."""
+    memtrace.start(frames)
+    return memtrace.status()
+
+@router.post("/memory/stop")
+def memory_stop():
+    memtrace.stop()
+    return memtrace.status()
+
+def _check_snapshots(*snapshot_ids: str):
+    for snapshot_id in snapshot_ids:
+        pid = memtrace.owner(snapshot_id)
+        if pid is not None and pid != os.getpid():
+            raise HTTPException(
+                status_code=409,
+                detail=f"Snapshot {snapshot_id} belongs to worker {pid}, this request was served by worker {os.getpid()}; retry until X-Worker-Pid is {pid}",
+            )
+
+@router.post("/memory/snapshots")
+def memory_snapshot(limit: int = Query(20, ge=1, le=500)):
+    """Takes a snapshot and returns its top modules and allocation sites."""
+    try:
+        snapshot_id = memtrace.snapshot()
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return memtrace.top(snapshot_id, limit)
+
+@router.get("/memory/snapshots/{snapshotId}")
+def memory_top(snapshotId: str, limit: int = Query(20, ge=1, le=500)):
+    _check_snapshots(snapshotId)
+    try:
+        return memtrace.top(snapshotId, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+@router.get("/memory/diff")
+def memory_diff(base: str, target: str, limit: int = Query(20, ge=1, le=500)):
+    """Growth from snapshot `base` to snapshot `target`, largest changes first."""
+    _check_snapshots(base, target)
+    try:
+        return memtrace.diff(base, target, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+# --- Slow queries ---
+
+@router.get("/slow_queries")
+def list_slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Most recent statements over ACL_SLOW_QUERY_MS in this worker, newest first."""
+    entries = list(slow_queries.recent)[::-1][:limit]
+    return {"threshold_ms": slow_queries.THRESHOLD_MS, "results": entries}
+
+@router.delete("/slow_queries", status_code=204)
+def clear_slow_queries():
+    slow_queries.recent.clear()
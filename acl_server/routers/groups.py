@@ -2,10 +2,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from database import get_db
-from models import Group, User, Policy
+import database
+from models import Group, User, user_groups
 from schemas import Group as GroupSchema, GroupCreation, GroupList, UserList, PolicyList, Pagination, User as UserSchema, Policy as PolicySchema
 from typing import List, Optional
 import time
+import shared_cache
+import statements
+import audit
+import repository
+import projection
 
 router = APIRouter(prefix="/auth/groups", tags=["auth"])
 
@@ -16,8 +22,10 @@ def list_groups(
     prefix: str = "",
     after: str = "",
     amount: int = 100,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    names = projection.parse(fields, projection.GROUP_FIELDS)
     query = db.query(Group)
     if prefix:
         query = query.filter(Group.id.startswith(prefix))
@@ -28,6 +36,10 @@ def list_groups(
     # Pagination
     if after:
         query = query.filter(Group.id > after)
+
+    if names is not None:
+        query = query.with_entities(*projection.columns(names, projection.GROUP_FIELDS, Group.id))
+        return projection.page(db, query.limit(amount + 1).all(), names, projection.GROUP_FIELDS, Group.id, amount)
     
     results = query.limit(amount + 1).all()
     has_more = len(results) > amount
@@ -53,7 +65,7 @@ def list_groups(
 
 @router.post("", response_model=GroupSchema, status_code=status.HTTP_201_CREATED)
 def create_group(group_in: GroupCreation, db: Session = Depends(get_db)):
-    if db.query(Group).filter(Group.id == group_in.id).first():
+    if repository.get_group(db, group_in.id):
         # Spec says 409 Conflict
         raise HTTPException(status_code=409, detail="Group already exists")
     
@@ -63,6 +75,7 @@ def create_group(group_in: GroupCreation, db: Session = Depends(get_db)):
         created_at=int(time.time())
     )
     db.add(new_group)
+    audit.record(db, "create_group", "group", new_group.id, after={"description": new_group.description})
     db.commit()
     db.refresh(new_group)
     
@@ -73,9 +86,25 @@ def create_group(group_in: GroupCreation, db: Session = Depends(get_db)):
         creation_date=new_group.created_at
     )
 
+def _create_default_group(group_id: str) -> GroupSchema:
+    # GET requests get the read-only session in embedded SQLite mode, so the
+    # insert goes through a writer session of its own
+    db = database.SessionLocal()
+    try:
+        new_group = repository.get_group(db, group_id) # created by a concurrent request
+        if new_group is None:
+            new_group = Group(id=group_id, description=f"Default {group_id} group", created_at=int(time.time()))
+            db.add(new_group)
+            audit.record(db, "create_group", "group", group_id, after={"description": new_group.description})
+            db.commit()
+            db.refresh(new_group)
+        return GroupSchema(id=new_group.id, name=new_group.id, description=new_group.description, creation_date=new_group.created_at)
+    finally:
+        db.close()
+
 @router.get("/{groupId}", response_model=GroupSchema)
 def get_group(groupId: str, db: Session = Depends(get_db)):
-    group = db.query(Group).filter(Group.id == groupId).first()
+    group = repository.get_group(db, groupId)
     if not group:
          # Setup Hack: lakeFS checks for "Admins", "SuperUsers", "Developers", "Viewers" during setup.
          # If they don't exist, we can optionally create them or just return 404.
@@ -88,11 +117,7 @@ def get_group(groupId: str, db: Session = Depends(get_db)):
          # So lakeFS tries to Add User to Group Admins?
          # Let's auto-create "Admins" if requested and missing, to smooth setup.
          if groupId in ["Admins", "SuperUsers", "Developers", "Viewers"]:
-             new_group = Group(id=groupId, description=f"Default {groupId} group", created_at=int(time.time()))
-             db.add(new_group)
-             db.commit()
-             db.refresh(new_group)
-             return GroupSchema(id=new_group.id, name=new_group.id, description=new_group.description, creation_date=new_group.created_at)
+             return _create_default_group(groupId)
 
          raise HTTPException(status_code=404, detail="Group not found")
     
@@ -107,11 +132,13 @@ from fastapi import Response
 
 @router.delete("/{groupId}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_group(groupId: str, db: Session = Depends(get_db)):
-    group = db.query(Group).filter(Group.id == groupId).first()
+    group = repository.get_group(db, groupId)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
+    audit.record(db, "delete_group", "group", groupId, before={"description": group.description})
     db.delete(group)
+    shared_cache.invalidate_all_policies(db)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -123,21 +150,31 @@ def list_group_members(
     prefix: str = "",
     after: str = "",
     amount: int = 100,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    group = db.query(Group).filter(Group.id == groupId).first()
+    names = projection.parse(fields, projection.USER_FIELDS)
+    group = repository.get_group(db, groupId)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
         
-    # In-memory filtering of members (Not efficient for large scale but easy for MVP)
-    # Ideally should join and filter in SQL
-    members = sorted(group.users, key=lambda u: u.id)
-    
+    # One join, filtered and paginated on the (group_id, user_id) index of auth_user_groups
+    query = (
+        db.query(User)
+        .join(user_groups, user_groups.c.user_id == User.id)
+        .filter(user_groups.c.group_id == groupId)
+    )
     if prefix:
-        members = [u for u in members if u.id.startswith(prefix)]
+        query = query.filter(user_groups.c.user_id.startswith(prefix))
     if after:
-        members = [u for u in members if u.id > after]
-        
+        query = query.filter(user_groups.c.user_id > after)
+    query = query.order_by(user_groups.c.user_id)
+
+    if names is not None:
+        query = query.with_entities(*projection.columns(names, projection.USER_FIELDS, User.id))
+        return projection.page(db, query.limit(amount + 1).all(), names, projection.USER_FIELDS, User.id, amount)
+
+    members = query.limit(amount + 1).all()
     has_more = len(members) > amount
     members = members[:amount]
     next_offset = members[-1].id if members else ""
@@ -164,32 +201,36 @@ def list_group_members(
 
 @router.put("/{groupId}/members/{userId}", status_code=status.HTTP_201_CREATED)
 def add_group_membership(groupId: str, userId: str, db: Session = Depends(get_db)):
-    group = db.query(Group).filter(Group.id == groupId).first()
+    group = repository.get_group(db, groupId)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
         
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
     if user not in group.users:
         group.users.append(user)
+        shared_cache.invalidate_user_policies(db, userId)
+        audit.record(db, "add_group_membership", "group", groupId, after={"member": userId})
         db.commit()
     
     return None
 
 @router.delete("/{groupId}/members/{userId}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_group_membership(groupId: str, userId: str, db: Session = Depends(get_db)):
-    group = db.query(Group).filter(Group.id == groupId).first()
+    group = repository.get_group(db, groupId)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
         
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
     if user in group.users:
         group.users.remove(user)
+        shared_cache.invalidate_user_policies(db, userId)
+        audit.record(db, "delete_group_membership", "group", groupId, before={"member": userId})
         db.commit()
         
     return None
@@ -204,7 +245,7 @@ def list_group_policies(
     amount: int = 100,
     db: Session = Depends(get_db)
 ):
-    group = db.query(Group).filter(Group.id == groupId).first()
+    group = repository.get_group(db, groupId)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
@@ -218,6 +259,7 @@ def list_group_policies(
     has_more = len(policies) > amount
     policies = policies[:amount]
     next_offset = policies[-1].id if policies else ""
+    statements.load(db, [h for p in policies for h in p.statement_hashes or []])
     
     return {
         "pagination": {
@@ -238,32 +280,36 @@ def list_group_policies(
 
 @router.put("/{groupId}/policies/{policyId}", status_code=status.HTTP_201_CREATED)
 def attach_policy_to_group(groupId: str, policyId: str, db: Session = Depends(get_db)):
-    group = db.query(Group).filter(Group.id == groupId).first()
+    group = repository.get_group(db, groupId)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    policy = db.query(Policy).filter(Policy.id == policyId).first()
+    policy = repository.get_policy(db, policyId)
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
         
     if policy not in group.policies:
         group.policies.append(policy)
+        shared_cache.invalidate_all_policies(db)
+        audit.record(db, "attach_policy_to_group", "group", groupId, after={"policy": policyId})
         db.commit()
         
     return None
 
 @router.delete("/{groupId}/policies/{policyId}", status_code=status.HTTP_204_NO_CONTENT)
 def detach_policy_from_group(groupId: str, policyId: str, db: Session = Depends(get_db)):
-    group = db.query(Group).filter(Group.id == groupId).first()
+    group = repository.get_group(db, groupId)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
         
-    policy = db.query(Policy).filter(Policy.id == policyId).first()
+    policy = repository.get_policy(db, policyId)
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
         
     if policy in group.policies:
         group.policies.remove(policy)
+        shared_cache.invalidate_all_policies(db)
+        audit.record(db, "detach_policy_from_group", "group", groupId, before={"policy": policyId})
         db.commit()
 
     return None
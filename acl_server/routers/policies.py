@@ -2,14 +2,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from database import get_db
-from models import Group, User, Policy
-from schemas import Policy as PolicySchema, PolicyList, Pagination
+from models import Group, Policy, user_policies, group_policies, user_groups
+from schemas import Policy as PolicySchema, PolicyList, Pagination, ResourceAccess, ResourceAccessEntry
 from typing import List, Optional
 import time
-
-# We might need logic for effective policies
-# from logic import get_effective_policies 
-# Let's reimplement simple effective policy logic here or import it if compatible
+import shared_cache
+import resource_index
+import statements
+import audit
+import repository
+import projection
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -20,8 +22,10 @@ def list_policies(
     prefix: str = "",
     after: str = "",
     amount: int = 100,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    names = projection.parse(fields, projection.POLICY_FIELDS)
     query = db.query(Policy)
     if prefix:
         query = query.filter(Policy.id.startswith(prefix))
@@ -30,11 +34,17 @@ def list_policies(
     
     if after:
         query = query.filter(Policy.id > after)
+
+    if names is not None:
+        # Without "statement", the statement hashes are not even read
+        query = query.with_entities(*projection.columns(names, projection.POLICY_FIELDS, Policy.id))
+        return projection.page(db, query.limit(amount + 1).all(), names, projection.POLICY_FIELDS, Policy.id, amount)
         
     results = query.limit(amount + 1).all()
     has_more = len(results) > amount
     results = results[:amount]
     next_offset = results[-1].id if results else ""
+    statements.load(db, [h for p in results for h in p.statement_hashes or []])
 
     return {
         "pagination": {
@@ -56,7 +66,7 @@ def list_policies(
 @router.post("/policies", response_model=PolicySchema, status_code=status.HTTP_201_CREATED)
 def create_policy(policy_in: PolicySchema, db: Session = Depends(get_db)):
     # ID is the name
-    if db.query(Policy).filter(Policy.id == policy_in.name).first():
+    if repository.get_policy(db, policy_in.name):
          raise HTTPException(status_code=409, detail="Policy already exists")
          
     new_policy = Policy(
@@ -66,6 +76,8 @@ def create_policy(policy_in: PolicySchema, db: Session = Depends(get_db)):
         acl=policy_in.acl
     )
     db.add(new_policy)
+    audit.record(db, "create_policy", "policy", new_policy.id, after={"statement": new_policy.statement, "acl": new_policy.acl})
+    resource_index.policy_changed(db, new_policy.id, new_policy.statement_hashes)
     db.commit()
     db.refresh(new_policy)
     
@@ -78,7 +90,7 @@ def create_policy(policy_in: PolicySchema, db: Session = Depends(get_db)):
 
 @router.get("/policies/{policyId}", response_model=PolicySchema)
 def get_policy(policyId: str, db: Session = Depends(get_db)):
-    policy = db.query(Policy).filter(Policy.id == policyId).first()
+    policy = repository.get_policy(db, policyId)
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
     
@@ -91,14 +103,20 @@ def get_policy(policyId: str, db: Session = Depends(get_db)):
 
 @router.put("/policies/{policyId}", response_model=PolicySchema)
 def update_policy(policyId: str, policy_in: PolicySchema, db: Session = Depends(get_db)):
-    policy = db.query(Policy).filter(Policy.id == policyId).first()
+    policy = repository.get_policy(db, policyId)
     if not policy:
          # Spec says update existing, if sends new ID (name) it might mean rename?
          # Usually Put on ID implies update content.
          raise HTTPException(status_code=404, detail="Policy not found")
     
+    before = {"statement": policy.statement, "acl": policy.acl}
+    old_hashes = policy.current_hashes
     policy.statement = [s.dict() for s in policy_in.statement]
-    policy.acl = policy_in.acl
+    # Re-PUTting an unchanged policy writes nothing and invalidates nothing
+    if policy.current_hashes != old_hashes or policy.acl != policy_in.acl:
+        policy.acl = policy_in.acl
+        audit.record(db, "update_policy", "policy", policyId, before=before, after={"statement": policy.statement, "acl": policy.acl})
+        resource_index.policy_changed(db, policyId, policy.statement_hashes)
     # policy.description? Schema doesn't have description for input? 
     # Actually Policy Schema has no description in spec.
     
@@ -116,14 +134,66 @@ from fastapi import Response
 
 @router.delete("/policies/{policyId}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_policy(policyId: str, db: Session = Depends(get_db)):
-    policy = db.query(Policy).filter(Policy.id == policyId).first()
+    policy = repository.get_policy(db, policyId)
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
         
+    audit.record(db, "delete_policy", "policy", policyId, before={"statement": policy.statement, "acl": policy.acl})
     db.delete(policy)
+    shared_cache.invalidate_all_policies(db)
+    resource_index.policy_deleted(db, policyId)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+# --- Resource Access ---
+
+@router.get("/resource_access", response_model=ResourceAccess)
+def get_resource_access(
+    action: str = Query(..., description="e.g. fs:ReadObject"),
+    resource: str = Query(..., description="e.g. arn:lakefs:fs:::repository/foo/object/bar"),
+    db: Session = Depends(get_db)
+):
+    """Every user and group whose effective policies allow or deny action on resource."""
+    resource_index.index.ensure_fresh(db)
+    matched = resource_index.index.match(action, resource)
+    if not matched:
+        return ResourceAccess(action=action, resource=resource, users=[], groups=[])
+
+    # Attachments of the matched policies, via the (policy_id, ...) reverse indexes
+    policy_ids = list(matched)
+    user_attachments = db.query(user_policies.c.user_id, user_policies.c.policy_id).filter(user_policies.c.policy_id.in_(policy_ids)).all()
+    group_attachments = db.query(group_policies.c.group_id, group_policies.c.policy_id).filter(group_policies.c.policy_id.in_(policy_ids)).all()
+
+    groups = {}
+    for group_id, policy_id in group_attachments:
+        groups.setdefault(group_id, set()).add(policy_id)
+
+    users = {}
+    for user_id, policy_id in user_attachments:
+        users.setdefault(user_id, (set(), set()))[0].add(policy_id)
+    if groups:
+        memberships = db.query(user_groups.c.user_id, user_groups.c.group_id).filter(user_groups.c.group_id.in_(list(groups))).all()
+        for user_id, group_id in memberships:
+            user_policy_ids, via_groups = users.setdefault(user_id, (set(), set()))
+            user_policy_ids.update(groups[group_id])
+            via_groups.add(group_id)
+
+    def effect(ids):
+        return "deny" if any("deny" in matched[i] for i in ids) else "allow"
+
+    return ResourceAccess(
+        action=action,
+        resource=resource,
+        users=[
+            ResourceAccessEntry(id=user_id, effect=effect(ids), policies=sorted(ids), via_groups=sorted(via))
+            for user_id, (ids, via) in sorted(users.items())
+        ],
+        groups=[
+            ResourceAccessEntry(id=group_id, effect=effect(ids), policies=sorted(ids))
+            for group_id, ids in sorted(groups.items())
+        ]
+    )
+
 # --- User Policies ---
 
 @router.get("/users/{userId}/policies", response_model=PolicyList)
@@ -133,29 +203,51 @@ def list_user_policies(
     prefix: str = "",
     after: str = "",
     amount: int = 100,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.id == userId).first()
-    if not user:
+    names = projection.parse(fields, projection.POLICY_FIELDS)
+    if not repository.user_exists(db, userId):
         raise HTTPException(status_code=404, detail="User not found")
-        
+
     if effective:
-        # Collect distinct policies from user + all groups
-        policies = set(user.policies)
-        for group in user.groups:
-            policies.update(group.policies)
-        policies = sorted(list(policies), key=lambda p: p.id)
+        # Collect distinct policies from user + all groups. The resolved IDs are
+        # shared between workers; only the policy rows themselves are read here.
+        policy_ids = shared_cache.effective_policies.get(userId)
+        if policy_ids is None:
+            version = shared_cache.effective_policies.version()
+            policies = repository.get_effective_policies(db, userId)
+            shared_cache.effective_policies.set(userId, sorted(p.id for p in policies), version=version)
+        else:
+            policies = repository.get_policies(db, policy_ids)
+        policies = sorted(policies, key=lambda p: p.id)
+        if prefix:
+            policies = [p for p in policies if p.id.startswith(prefix)]
+        if after:
+            policies = [p for p in policies if p.id > after]
     else:
-        policies = sorted(user.policies, key=lambda p: p.id)
-        
-    if prefix:
-        policies = [p for p in policies if p.id.startswith(prefix)]
-    if after:
-        policies = [p for p in policies if p.id > after]
+        # One join, filtered and paginated on auth_user_policies' (user_id, policy_id) primary key
+        query = (
+            db.query(Policy)
+            .join(user_policies, user_policies.c.policy_id == Policy.id)
+            .filter(user_policies.c.user_id == userId)
+        )
+        if prefix:
+            query = query.filter(user_policies.c.policy_id.startswith(prefix))
+        if after:
+            query = query.filter(user_policies.c.policy_id > after)
+        query = query.order_by(user_policies.c.policy_id)
+        if names is not None:
+            query = query.with_entities(*projection.columns(names, projection.POLICY_FIELDS, Policy.id))
+        policies = query.limit(amount + 1).all()
+
+    if names is not None:
+        return projection.page(db, policies, names, projection.POLICY_FIELDS, Policy.id, amount)
         
     has_more = len(policies) > amount
     policies = policies[:amount]
     next_offset = policies[-1].id if policies else ""
+    statements.load(db, [h for p in policies for h in p.statement_hashes or []])
     
     return {
         "pagination": {
@@ -176,32 +268,36 @@ def list_user_policies(
 
 @router.put("/users/{userId}/policies/{policyId}", status_code=status.HTTP_201_CREATED)
 def attach_policy_to_user(userId: str, policyId: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    policy = db.query(Policy).filter(Policy.id == policyId).first()
+    policy = repository.get_policy(db, policyId)
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
         
     if policy not in user.policies:
         user.policies.append(policy)
+        shared_cache.invalidate_user_policies(db, userId)
+        audit.record(db, "attach_policy_to_user", "user", userId, after={"policy": policyId})
         db.commit()
     
     return None
 
 @router.delete("/users/{userId}/policies/{policyId}", status_code=status.HTTP_204_NO_CONTENT)
 def detach_policy_from_user(userId: str, policyId: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    policy = db.query(Policy).filter(Policy.id == policyId).first()
+    policy = repository.get_policy(db, policyId)
     if not policy:
         raise HTTPException(status_code=404, detail="Policy not found")
         
     if policy in user.policies:
         user.policies.remove(policy)
+        shared_cache.invalidate_user_policies(db, userId)
+        audit.record(db, "detach_policy_from_user", "user", userId, before={"policy": policyId})
         db.commit()
         
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from database import get_db
+import reports
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+def _stream(db: Session):
+    # get_db has already closed the session by the time the body streams; the
+    # session reconnects on first use, so release that connection when done.
+    try:
+        yield from reports.access_matrix_csv(db)
+    finally:
+        db.close()
+
+@router.get("/access_matrix")
+def get_access_matrix(db: Session = Depends(get_db)):
+    """User x (action, resource pattern) allow/deny matrix as streamed CSV."""
+    return StreamingResponse(
+        _stream(db),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="access_matrix.csv"'}
+    )
@@ -2,13 +2,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from database import get_db
-from models import User
-from schemas import User as UserSchema, UserCreation, UserList, UserPassword, Pagination
+from models import User, Group, user_groups
+from schemas import User as UserSchema, UserCreation, UserList, UserPassword, Pagination, GroupList, Group as GroupSchema
 from typing import List, Optional
+import json
 import time
+import shared_cache
+import audit
+import repository
+import projection
 
 router = APIRouter(prefix="/auth/users", tags=["auth"])
 
+def _audit_snapshot(user: User) -> dict:
+    return {
+        "friendly_name": user.friendly_name,
+        "email": user.email,
+        "source": user.source,
+        "external_id": user.external_id,
+        "encryptedPassword": audit.REDACTED if user.encrypted_password else None,
+    }
+
 @router.get("", response_model=UserList)
 def list_users(
     prefix: str = "",
@@ -21,8 +35,15 @@ def list_users(
                                # Let's ignore it for now or support it loosely.
     email: Optional[str] = None,
     external_id: Optional[str] = None,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    names = projection.parse(fields, projection.USER_FIELDS)
+
+    # SSO login lookups (lakeFS OIDC/LDAP): indexed and cached path
+    if (email or external_id) and not prefix and not after and names is None:
+        return lookup_users_by_identity(db, email, external_id, amount)
+
     query = db.query(User)
     
     # Filtering
@@ -39,8 +60,36 @@ def list_users(
     # Pagination
     if after:
         query = query.filter(User.id > after)
+
+    if names is not None:
+        query = query.with_entities(*projection.columns(names, projection.USER_FIELDS, User.id))
+        return projection.page(db, query.limit(amount + 1).all(), names, projection.USER_FIELDS, User.id, amount)
         
-    results = query.limit(amount + 1).all()
+    return _user_page(query.limit(amount + 1).all(), amount)
+
+def lookup_users_by_identity(db: Session, email: Optional[str], external_id: Optional[str], amount: int) -> dict:
+    # SSO logins resolve users by external_id/email on every login
+    key = json.dumps([email, external_id, amount])
+    page = shared_cache.identities.get(key)
+    if page is not None:
+        return page
+    version = shared_cache.identities.version()
+
+    # Served by the partial indexes on email / external_id
+    query = db.query(User)
+    if external_id:
+        query = query.filter(User.external_id == external_id)
+    if email:
+        query = query.filter(User.email == email)
+
+    page = _user_page(query.order_by(User.id).limit(amount + 1).all(), amount)
+    # Not cached when empty: the user is typically created right after a miss
+    if page["results"]:
+        results = [u.model_dump() for u in page["results"]]
+        shared_cache.identities.set(key, dict(page, results=results), version=version)
+    return page
+
+def _user_page(results: List[User], amount: int) -> dict:
     has_more = len(results) > amount
     results = results[:amount]
     next_offset = results[-1].id if results else ""
@@ -67,7 +116,7 @@ def list_users(
 
 @router.post("", response_model=UserSchema, status_code=status.HTTP_201_CREATED)
 def create_user(user_in: UserCreation, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.id == user_in.username).first():
+    if repository.get_user(db, user_in.username):
         raise HTTPException(status_code=409, detail="User already exists")
     
     new_user = User(
@@ -80,6 +129,8 @@ def create_user(user_in: UserCreation, db: Session = Depends(get_db)):
         external_id=user_in.external_id
     )
     db.add(new_user)
+    audit.record(db, "create_user", "user", new_user.id, after=_audit_snapshot(new_user))
+    shared_cache.invalidate_identities(db)
     db.commit()
     db.refresh(new_user)
     
@@ -99,7 +150,7 @@ def create_user(user_in: UserCreation, db: Session = Depends(get_db)):
 
 @router.get("/{userId}", response_model=UserSchema)
 def get_user(userId: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -113,40 +164,93 @@ def get_user(userId: str, db: Session = Depends(get_db)):
         external_id=user.external_id
     )
 
+@router.get("/{userId}/groups", response_model=GroupList)
+def list_user_groups(
+    userId: str,
+    prefix: str = "",
+    after: str = "",
+    amount: int = 100,
+    db: Session = Depends(get_db)
+):
+    # One join, filtered and paginated on auth_user_groups' (user_id, group_id) primary key
+    query = (
+        db.query(Group)
+        .join(user_groups, user_groups.c.group_id == Group.id)
+        .filter(user_groups.c.user_id == userId)
+    )
+    if prefix:
+        query = query.filter(user_groups.c.group_id.startswith(prefix))
+    if after:
+        query = query.filter(user_groups.c.group_id > after)
+
+    results = query.order_by(user_groups.c.group_id).limit(amount + 1).all()
+    # Only an empty page needs to tell "no groups" from "no such user"
+    if not results and not repository.user_exists(db, userId):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    has_more = len(results) > amount
+    results = results[:amount]
+    next_offset = results[-1].id if results else ""
+
+    return {
+        "pagination": {
+            "has_more": has_more,
+            "max_per_page": amount,
+            "results": len(results),
+            "next_offset": next_offset
+        },
+        "results": [
+            GroupSchema(
+                id=g.id,
+                name=g.id,
+                description=g.description,
+                creation_date=g.created_at
+            ) for g in results
+        ]
+    }
+
 from fastapi import Response
 
 @router.delete("/{userId}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(userId: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         # Spec says delete must match existing. 
         # But commonly delete idempotent returns 204 if not found? 
         # Spec says 404 if not matches.
         raise HTTPException(status_code=404, detail="User not found")
     
+    audit.record(db, "delete_user", "user", userId, before=_audit_snapshot(user))
     db.delete(user)
+    shared_cache.invalidate_user(db, userId)
+    shared_cache.invalidate_identities(db)
     db.commit()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.put("/{userId}/password")
 def update_user_password(userId: str, password: UserPassword, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
     user.encrypted_password = password.encryptedPassword
+    audit.record(db, "update_user_password", "user", userId, after={"encryptedPassword": audit.REDACTED})
+    shared_cache.invalidate_identities(db)
     db.commit()
     return {"message": "Password updated successfully"}
 
 @router.put("/{userId}/friendly_name", status_code=status.HTTP_204_NO_CONTENT)
 def update_user_friendly_name(userId: str, payload: dict, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == userId).first()
+    user = repository.get_user(db, userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if "friendly_name" not in payload:
          raise HTTPException(status_code=400, detail="Missing friendly_name")
 
+    before = {"friendly_name": user.friendly_name}
     user.friendly_name = payload["friendly_name"]
+    audit.record(db, "update_user_friendly_name", "user", userId, before=before, after={"friendly_name": user.friendly_name})
+    shared_cache.invalidate_identities(db)
     db.commit()
     return None
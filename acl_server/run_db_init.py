@@ -70,18 +70,12 @@ if __name__ == "__main__":
     # 2. Initialize Tables and Data
     # Import here to avoid early engine bindings failing if DB didn't exist
     try:
-        from database import engine, Base, SessionLocal
-        from init_db import init_db_data
+        from database import engine
+        from init_db import initialize_database
         
-        print("Creating tables...")
-        Base.metadata.create_all(bind=engine)
-        
-        print("Initializing data...")
-        db = SessionLocal()
-        try:
-            init_db_data(db)
-        finally:
-            db.close()
+        print("Migrating schema and initializing data...")
+        if not initialize_database(engine):
+            print("Schema and seed data already up to date.")
             
         print("Database initialization completed successfully.")
         
@@ -78,10 +78,24 @@ class PolicyList(BaseModel):
     pagination: Pagination
     results: List[Policy]
 
+class ResourceAccessEntry(BaseModel):
+    id: str
+    effect: str = Field(..., description="deny if any matching statement denies, otherwise allow.")
+    policies: List[str]
+    via_groups: List[str] = Field(default_factory=list, description="Users only: groups through which the policies apply.")
+
+class ResourceAccess(BaseModel):
+    action: str
+    resource: str
+    users: List[ResourceAccessEntry]
+    groups: List[ResourceAccessEntry]
+
 # --- Credentials ---
 class Credentials(BaseModel):
     access_key_id: str
     creation_date: int
+    last_used_date: Optional[int] = Field(None, description="Unix Epoch in seconds; updated periodically, may lag.")
+    use_count: int = 0
 
 class CredentialsCreation(BaseModel):
     access_key_id: Optional[str] = None
@@ -97,3 +111,49 @@ class CredentialsWithSecret(BaseModel):
     creation_date: int
     user_id: Optional[int] = None # Deprecated, must be int
     user_name: Optional[str] = None
+
+class AuthBundle(BaseModel):
+    """Everything needed to authenticate and authorize a request made with one access key."""
+    credentials: CredentialsWithSecret
+    user: User
+    groups: List[str]
+    policies: List[Policy]
+
+# --- Batch ---
+class BatchOperation(BaseModel):
+    op: str = Field(..., description="Name of the equivalent API operation, e.g. create_user.")
+    path: Dict[str, str] = Field(default_factory=dict, description="Path parameters, e.g. userId.")
+    body: Optional[Dict[str, Any]] = None
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., max_length=1000)
+
+class BatchResult(BaseModel):
+    op: str
+    status: int
+    result: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
+
+# --- Audit ---
+class AuditEvent(BaseModel):
+    id: int
+    created_at: int = Field(..., description="Unix Epoch in seconds.")
+    actor: Optional[str] = None
+    action: str
+    target_type: str
+    target_id: str
+    before: Optional[Dict[str, Any]] = None
+    after: Optional[Dict[str, Any]] = None
+
+class AuditEventList(BaseModel):
+    pagination: Pagination
+    results: List[AuditEvent]
+
+class AuditStats(BaseModel):
+    queued: int
+    enqueued: int
+    dropped: int
+    written: int
+    failed: int
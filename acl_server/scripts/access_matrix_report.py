@@ -0,0 +1,29 @@
+import os
+import sys
+
+# Add acl_server to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal
+import reports
+
+def write_access_matrix(out):
+    """Writes the access matrix CSV (see reports.py) to a file object."""
+    db = SessionLocal()
+    try:
+        for chunk in reports.access_matrix_csv(db):
+            out.write(chunk)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print("Usage: python access_matrix_report.py [output.csv]")
+        sys.exit(1)
+
+    if len(sys.argv) == 2:
+        with open(sys.argv[1], "w", newline="") as f:
+            write_access_matrix(f)
+        print(f"Access matrix written to {sys.argv[1]}")
+    else:
+        write_access_matrix(sys.stdout)
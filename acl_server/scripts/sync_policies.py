@@ -0,0 +1,32 @@
+import os
+import sys
+
+# Add acl_server to path to allow imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal, engine
+import audit
+import policy_sync
+
+USAGE = "Usage: python sync_policies.py <definitions_dir> [--dry-run] [--prune]"
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    flags = {a for a in sys.argv[1:] if a.startswith("--")}
+    if len(args) != 1 or flags - {"--dry-run", "--prune"}:
+        print(USAGE)
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        plan = policy_sync.sync(db, args[0], dry_run="--dry-run" in flags, prune="--prune" in flags)
+        print(plan.report())
+        if "--dry-run" in flags:
+            print("Dry run: nothing was written.")
+    except ValueError as e:
+        print(f"Invalid definitions: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+        # Audit events are queued on commit; nothing else writes them in this process
+        audit.writer.drain(engine)
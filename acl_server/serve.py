@@ -0,0 +1,176 @@
+import math
+import os
+import signal
+import sys
+import time
+import traceback
+import uvicorn
+
+# Add current dir to path to allow imports
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Multi-process serving entrypoint.
+#
+# The parent imports the app, runs startup initialization once and binds the
+# listening socket, then forks ACL_WORKERS uvicorn workers that share it. Workers
+# inherit the preloaded modules and skip initialization (already done in the
+# parent). On SIGTERM/SIGINT the parent asks every worker to drain and exit,
+# and kills stragglers after ACL_GRACEFUL_TIMEOUT seconds.
+#
+# Workers that die are restarted. Ones that die within MIN_UPTIME of starting
+# are restarted with exponential backoff, and after MAX_FAST_FAILURES such
+# deaths in a row the parent shuts down and exits non-zero (a broken config
+# should fail the pod, not fork-loop).
+
+def available_cpus() -> int:
+    """CPUs this process may use: its affinity mask, capped by the cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError: # not Linux
+        cpus = os.cpu_count() or 1
+    quota = None
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f: # cgroup v2: "<quota> <period>" or "max <period>"
+            limit, period = f.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try: # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+HOST = os.getenv("ACL_HOST", "0.0.0.0")
+PORT = int(os.getenv("ACL_PORT", "9000"))
+WORKERS = int(os.getenv("ACL_WORKERS", "0")) or available_cpus()
+GRACEFUL_TIMEOUT = float(os.getenv("ACL_GRACEFUL_TIMEOUT", "30"))
+LOG_LEVEL = os.getenv("ACL_LOG_LEVEL", "info")
+MIN_UPTIME = 10 # seconds; a worker that dies sooner counts as a failed start
+MAX_FAST_FAILURES = 5
+MAX_RESTART_DELAY = 30
+
+def run_worker(config: uvicorn.Config, sock):
+    # Connections in the inherited pool belong to the parent; never reuse them here
+    import database
+    database.reset_after_fork()
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+def main():
+    # Preload: everything imported here is shared copy-on-write with the workers
+    from main import app
+    import database
+    from init_db import initialize_database
+
+    initialize_database(database.engine)
+    # Close the parent's connections before forking so no socket is ever shared
+    database.engine.dispose()
+    database.read_engine.dispose()
+
+    config = uvicorn.Config(
+        app,
+        host=HOST,
+        port=PORT,
+        log_level=LOG_LEVEL,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+    sock = config.bind_socket()
+
+    workers = {} # pid -> start time
+    restarts = [] # times at which to start replacement workers
+    fast_failures = 0
+    failed = False
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            # os._exit skips the interpreter's own handling, so a crash has to
+            # be reported and turned into a failing status here
+            code = 1
+            try:
+                run_worker(config, sock)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else int(e.code is not None)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        print(f"Received signal {signum}, draining {len(workers)} workers...")
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Starting {WORKERS} workers on {HOST}:{PORT}")
+    for _ in range(WORKERS):
+        spawn()
+
+    deadline = None
+    while workers or (restarts and not stopping):
+        pid, status = os.waitpid(-1, os.WNOHANG) if workers else (0, 0)
+        if pid:
+            started = workers.pop(pid)
+            status = os.waitstatus_to_exitcode(status)
+            if not stopping:
+                fast_failures = fast_failures + 1 if time.monotonic() - started < MIN_UPTIME else 0
+                if fast_failures >= MAX_FAST_FAILURES:
+                    print(f"Worker {pid} exited with status {status}; {fast_failures} workers in a row died on startup, giving up")
+                    failed = True
+                    stop(signal.SIGTERM, None)
+                    continue
+                delay = min(MAX_RESTART_DELAY, 2 ** fast_failures - 1)
+                print(f"Worker {pid} exited with status {status}, restarting in {delay}s")
+                restarts.append(time.monotonic() + delay)
+            continue
+
+        if not stopping:
+            now = time.monotonic()
+            for at in [at for at in restarts if at <= now]:
+                restarts.remove(at)
+                spawn()
+
+        if stopping:
+            deadline = deadline or time.monotonic() + GRACEFUL_TIMEOUT + 5
+            if time.monotonic() > deadline:
+                for pid in workers:
+                    print(f"Worker {pid} did not exit in time, killing")
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+        time.sleep(0.2)
+
+    sock.close()
+    print("All workers stopped.")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+from sqlalchemy.orm import Session
+from database import on_commit
+
+# Cross-worker read cache in anonymous shared memory.
+#
+# The mapping is created at import time, i.e. in the serving parent before it
+# forks (see serve.py), so all workers on a host read and write the same pages.
+# Layout: a small header followed by fixed-size, direct-mapped slots.
+#
+#   header: generation (bumped by clear()), epoch (bumped by every invalidation)
+#   slot:   seq, key hash, generation, expires_at, payload length, payload
+#
+# Readers never lock: a writer makes `seq` odd while it rewrites a slot and even
+# again when done, and readers retry if `seq` changed under them. Writers are
+# serialized across threads and processes by a lockf() lock, which the kernel
+# releases if a worker dies while holding it.
+
+_HEADER = struct.Struct("<QQ")
+_SLOT = struct.Struct("<IQQdI")
+_SEQ = struct.Struct("<I")
+
+class _WriterLock:
+    def __init__(self):
+        self._thread_lock = threading.Lock()
+        self._file = tempfile.TemporaryFile()
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        fcntl.lockf(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.lockf(self._file, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+class SharedCache:
+    def __init__(self, slots: int, slot_size: int, ttl: float):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self._mm = mmap.mmap(-1, _HEADER.size + slots * slot_size)
+        self._lock = _WriterLock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _locate(self, key: str):
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        return key_hash, _HEADER.size + (key_hash % self.slots) * self.slot_size
+
+    def _header(self):
+        return _HEADER.unpack_from(self._mm, 0)
+
+    def version(self) -> int:
+        """Invalidation epoch; pass it to set() to avoid caching data read before an invalidation."""
+        return self._header()[1]
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        key_hash, offset = self._locate(key)
+        generation = self._header()[0]
+
+        for _ in range(3):
+            seq, slot_hash, slot_generation, expires_at, length = _SLOT.unpack_from(self._mm, offset)
+            if seq & 1:
+                continue
+            if slot_hash != key_hash or slot_generation != generation or length == 0 or expires_at < time.time():
+                return None
+            start = offset + _SLOT.size
+            payload = self._mm[start:start + length]
+            if _SEQ.unpack_from(self._mm, offset)[0] != seq:
+                continue
+            stored_key, value = json.loads(payload)
+            return value if stored_key == key else None
+        return None
+
+    def _write_slot(self, offset: int, key_hash: int, generation: int, expires_at: float, payload: bytes):
+        seq = _SEQ.unpack_from(self._mm, offset)[0]
+        _SEQ.pack_into(self._mm, offset, (seq + 1) & 0xFFFFFFFF)
+        self._mm[offset + _SLOT.size:offset + _SLOT.size + len(payload)] = payload
+        _SLOT.pack_into(self._mm, offset, (seq + 1) & 0xFFFFFFFF, key_hash, generation, expires_at, len(payload))
+        _SEQ.pack_into(self._mm, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def set(self, key: str, value: Any, version: Optional[int] = None) -> bool:
+        """
+        Stores value (JSON-serializable) under key. If `version` is given and an
+        invalidation happened since it was taken, nothing is stored.
+        """
+        if not self.enabled:
+            return False
+        payload = json.dumps([key, value], separators=(",", ":")).encode()
+        if len(payload) > self.slot_size - _SLOT.size:
+            return False
+
+        key_hash, offset = self._locate(key)
+        with self._lock:
+            generation, epoch = self._header()
+            if version is not None and version != epoch:
+                return False
+            self._write_slot(offset, key_hash, generation, time.time() + self.ttl, payload)
+        return True
+
+    def delete(self, key: str):
+        key_hash, offset = self._locate(key)
+        with self._lock:
+            generation, epoch = self._header()
+            self._write_slot(offset, 0, 0, 0.0, b"")
+            _HEADER.pack_into(self._mm, 0, generation, epoch + 1)
+
+    def clear(self):
+        with self._lock:
+            generation, epoch = self._header()
+            _HEADER.pack_into(self._mm, 0, generation + 1, epoch + 1)
+
+# --- Cache instances ---
+
+CACHE_TTL = float(os.getenv("ACL_SHARED_CACHE_TTL", "30"))
+CACHE_SLOTS = int(os.getenv("ACL_SHARED_CACHE_SLOTS", "4096"))
+IDENTITY_CACHE_TTL = float(os.getenv("ACL_IDENTITY_CACHE_TTL", "10"))
+
+# access key id -> {"user_id", "secret" (still encrypted), "created_at"}
+credentials = SharedCache(CACHE_SLOTS, 512, CACHE_TTL)
+# user id -> sorted list of effective policy ids
+effective_policies = SharedCache(CACHE_SLOTS, 2048, CACHE_TTL)
+# [email, external_id, amount] -> user list page (SSO logins, see routers/users.py)
+identities = SharedCache(CACHE_SLOTS, 2048, IDENTITY_CACHE_TTL)
+
+# --- Invalidation (applied once the mutating transaction commits) ---
+
+def invalidate_credentials(db: Session, access_key_id: str):
+    on_commit(db, lambda: credentials.delete(access_key_id))
+
+def invalidate_user(db: Session, user_id: str):
+    """The user's keys are not known here, so all cached credentials go."""
+    on_commit(db, credentials.clear)
+    on_commit(db, lambda: effective_policies.delete(user_id))
+
+def invalidate_user_policies(db: Session, user_id: str):
+    on_commit(db, lambda: effective_policies.delete(user_id))
+
+def invalidate_all_policies(db: Session):
+    """Group-level changes affect every member; drop all effective policy entries."""
+    on_commit(db, effective_policies.clear)
+
+def invalidate_identities(db: Session):
+    """Any user change may change a cached lookup result; they are cheap to refill."""
+    on_commit(db, identities.clear)
@@ -0,0 +1,107 @@
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, List, Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Slow-query log.
+#
+# Cursor execution hooks time every statement on the engine. Statements slower
+# than THRESHOLD_MS are printed and kept in a per-worker ring buffer (see
+# GET /api/v1/debug/slow_queries) together with the route template that issued
+# them, the shape of their parameters (types only, never values) and, for
+# SELECTs, the query plan. ACL_SLOW_QUERY_EXPLAIN picks the plan: "off",
+# "plan" (EXPLAIN / EXPLAIN QUERY PLAN) or "analyze" (EXPLAIN ANALYZE on
+# Postgres, which runs the query a second time; for debugging only).
+
+THRESHOLD_MS = float(os.getenv("ACL_SLOW_QUERY_MS", "200"))
+EXPLAIN = os.getenv("ACL_SLOW_QUERY_EXPLAIN", "plan")
+BUFFER_SIZE = int(os.getenv("ACL_SLOW_QUERY_BUFFER", "100"))
+
+recent = deque(maxlen=BUFFER_SIZE)
+
+_route: ContextVar[Optional[str]] = ContextVar("slow_query_route", default=None)
+
+async def capture_route(request: Request):
+    """
+    Router dependency: remembers the route template for statements issued by
+    this request. Async for the same reason as audit.capture_actor.
+    """
+    route = request.scope.get("route")
+    _route.set(getattr(route, "path", request.url.path))
+
+def param_shape(parameters: Any) -> Any:
+    """Bound parameters with every value replaced by its type name."""
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[List[str]]:
+    if EXPLAIN not in ("plan", "analyze") or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN ANALYZE " if EXPLAIN == "analyze" else "EXPLAIN "
+    else:
+        return None
+    # Raw DBAPI cursor: bypasses these hooks. It shares the request's
+    # transaction, so on Postgres a failed EXPLAIN (e.g. EXPLAIN ANALYZE hitting
+    # the request's statement_timeout) is rolled back to a savepoint instead of
+    # aborting the request's transaction.
+    savepoint = dialect == "postgresql"
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = [" ".join(str(c) for c in row) for row in cursor.fetchall()]
+        except Exception as e:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            plan = [f"EXPLAIN failed: {e}"]
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        return plan
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    if THRESHOLD_MS < 0 or elapsed_ms < THRESHOLD_MS:
+        return
+
+    entry = {
+        "at": time.time(),
+        "duration_ms": round(elapsed_ms, 3),
+        "route": _route.get(),
+        "statement": statement,
+        "params": param_shape(parameters[0] if executemany and parameters else parameters),
+        "executemany": len(parameters) if executemany else None,
+        "plan": None if executemany else _explain(conn, statement, parameters),
+    }
+    recent.append(entry)
+    print(f"Slow query ({entry['duration_ms']} ms, route {entry['route']}): {' '.join(statement.split())[:500]}")
+
+def _handle_error(context):
+    # Failed statements never reach after_cursor_execute
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+def install(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import BigInteger, Column, JSON, String, Table, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from database import Base
+
+# Content-addressed policy statements.
+#
+# Statements are stored exactly as submitted, once, in auth_policy_statements
+# under the SHA-256 of their JSON with sorted keys (key order is the only thing
+# canonicalized, so a GET returns the document that was PUT); policies keep the
+# ordered list of hashes (Policy.statement_hashes). Templated policies that
+# share statements share the rows.
+#
+# Every statement seen by this process is interned by hash: all policies,
+# caches and matchers get the same (read-only) dict and the same parsed form
+# for equal statements. Rows are immutable, so the intern table never needs
+# invalidation; it only grows with the number of distinct statements.
+
+policy_statements = Table('auth_policy_statements', Base.metadata,
+    Column('hash', String(64), primary_key=True),
+    Column('body', JSON, nullable=False),
+    Column('created_at', BigInteger, default=lambda: int(time.time())),
+)
+
+_lock = threading.Lock()
+_interned: Dict[str, dict] = {}
+_parsed: Dict[str, Tuple[str, List[str], List[str]]] = {}
+
+def digest(statement: dict) -> str:
+    return hashlib.sha256(json.dumps(statement, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+def _put(statement_hash: str, body: dict) -> dict:
+    with _lock:
+        return _interned.setdefault(statement_hash, body)
+
+def intern(statement: dict) -> str:
+    """Interns a statement; returns its hash."""
+    statement_hash = digest(statement)
+    if statement_hash not in _interned:
+        _put(statement_hash, statement)
+    return statement_hash
+
+def intern_all(statement: Iterable[dict]) -> List[str]:
+    return [intern(s) for s in statement or []]
+
+def current(hashes: Optional[List[str]], inline: Optional[list]) -> List[str]:
+    """
+    A policy's statement hashes from its two columns (interning the inline
+    statements). Until the inline column is dropped it is the source of truth:
+    replicas on the previous release update only it, leaving the hashes stale.
+    """
+    if inline is None:
+        return hashes or []
+    return intern_all(inline)
+
+def get(statement_hash: str) -> dict:
+    return _interned[statement_hash]
+
+def parsed(statement_hash: str) -> Tuple[str, List[str], List[str]]:
+    """(effect, actions, resources) of an interned statement, computed once per hash."""
+    result = _parsed.get(statement_hash)
+    if result is None:
+        result = _parsed.setdefault(statement_hash, parse_statement(_interned[statement_hash]))
+    return result
+
+def parse_statement(statement: dict) -> Tuple[str, List[str], List[str]]:
+    """
+    Normalizes a stored statement to (effect, actions, resources). lakeFS
+    accepts a single action string, and a JSON array of ARNs as resource.
+    """
+    actions = statement.get("action") or []
+    if isinstance(actions, str):
+        actions = [actions]
+    resource = statement.get("resource") or ""
+    resources = [resource]
+    if resource.startswith("["):
+        try:
+            resources = [str(r) for r in json.loads(resource)]
+        except ValueError:
+            pass
+    return (statement.get("effect") or "").lower(), list(actions), resources
+
+# --- Database side (db may be a Session or a Connection) ---
+
+def _dialect(db) -> str:
+    bind = db.get_bind() if hasattr(db, "get_bind") else db
+    return bind.dialect.name
+
+def load(db, hashes: Iterable[str]):
+    """Interns the given statements, reading the ones not yet known in one query."""
+    missing = sorted({h for h in hashes if h not in _interned})
+    if not missing:
+        return
+    rows = db.execute(select(policy_statements.c.hash, policy_statements.c.body).where(policy_statements.c.hash.in_(missing)))
+    for statement_hash, body in rows:
+        _put(statement_hash, body)
+
+def resolve(db, hashes: List[str]) -> List[dict]:
+    if db is not None:
+        load(db, hashes)
+    return [_interned[h] for h in hashes]
+
+def store(db, hashes: Iterable[str]):
+    """Writes interned statements that are not in the database yet."""
+    hashes = sorted(set(hashes))
+    if not hashes:
+        return
+    existing = set(db.execute(select(policy_statements.c.hash).where(policy_statements.c.hash.in_(hashes))).scalars())
+    now = int(time.time())
+    rows = [{"hash": h, "body": _interned[h], "created_at": now} for h in hashes if h not in existing]
+    if not rows:
+        return
+    # Another worker may insert the same statement concurrently
+    dialect = _dialect(db)
+    if dialect == "postgresql":
+        stmt = postgresql.insert(policy_statements).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(policy_statements).on_conflict_do_nothing()
+    else:
+        stmt = insert(policy_statements)
+    db.execute(stmt, rows)
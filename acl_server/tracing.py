@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Request tracing.
+#
+# Each API request gets a server span, continuing the W3C trace context
+# (traceparent header) sent by lakeFS when present, and returns its own
+# span in a traceresponse header. Nested spans cover token
+# verification, session connection checkout, every SQL statement, secret
+# encryption/decryption and response rendering. Finished spans are handed to
+# the registered exporters; tracing costs nothing when none is registered.
+#
+# Exporters are objects with an export(span: dict) method; add_exporter()
+# registers one. ACL_TRACE_FILE registers a JsonLinesExporter on startup.
+
+TRACE_FILE = os.getenv("ACL_TRACE_FILE")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+exporters: List[Any] = []
+
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+        }
+
+class JsonLinesExporter:
+    """Appends one JSON object per finished span to a file."""
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, span: dict):
+        line = json.dumps(span, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+def add_exporter(exporter):
+    exporters.append(exporter)
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+def _finish(span: Span):
+    span.end_ns = span.end_ns or time.time_ns()
+    data = span.to_dict()
+    for exporter in exporters:
+        try:
+            exporter.export(data)
+        except Exception as e:
+            print(f"Trace exporter failed: {e}")
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current one. No-op outside a traced request."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, parent.span_id, attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        _finish(child)
+
+def record(name: str, start_ns: int, **attributes):
+    """A child span of the current one that started at start_ns and ends now."""
+    parent = _current.get()
+    if parent is None:
+        return
+    child = Span(name, parent.trace_id, parent.span_id, attributes)
+    child.start_ns = start_ns
+    _finish(child)
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or None."""
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not exporters:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        incoming = parse_traceparent(headers.get("traceparent"))
+        if incoming and not incoming[2]:
+            # lakeFS decided not to sample this trace
+            await self.app(scope, receive, send)
+            return
+        trace_id, parent_id = (incoming[0], incoming[1]) if incoming else (secrets.token_hex(16), None)
+
+        server = Span(f"{scope['method']} {scope['path']}", trace_id, parent_id, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+            "process.pid": os.getpid(),
+        })
+
+        async def send_with_status(message: Message):
+            if message["type"] == "http.response.start":
+                server.attributes["http.status_code"] = message["status"]
+                # Lets the caller find this request's spans (W3C traceresponse)
+                message["headers"] = list(message.get("headers", [])) + [(b"traceresponse", server.traceparent().encode())]
+            await send(message)
+
+        token = _current.set(server)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                server.name = f"{scope['method']} {route.path}"
+                server.attributes["http.route"] = route.path
+            _finish(server)
+
+class TracedJSONResponse(JSONResponse):
+    """Default response class: times rendering the response body."""
+    def render(self, content: Any) -> bytes:
+        with span("response.render"):
+            return super().render(content)
+
+# --- Database instrumentation ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("trace_start", []).append(time.time_ns())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("trace_start")
+    if starts:
+        record("db.query", starts.pop(), **{"db.system": conn.dialect.name, "db.statement": " ".join(statement.split())[:1000]})
+
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("trace_start"):
+        context.connection.info["trace_start"].pop()
+
+def _do_orm_execute(orm_execute_state):
+    # The first statement of a session is what checks a connection out of the pool
+    session = orm_execute_state.session
+    if _current.get() is not None and not session.in_transaction():
+        session.info["trace_checkout_start"] = time.time_ns()
+
+def _after_begin(session, transaction, connection):
+    start = session.info.pop("trace_checkout_start", None)
+    if start is not None:
+        record("db.checkout", start)
+
+def install(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    if not event.contains(Session, "do_orm_execute", _do_orm_execute):
+        event.listen(Session, "do_orm_execute", _do_orm_execute)
+        event.listen(Session, "after_begin", _after_begin)
+
+if TRACE_FILE:
+    add_exporter(JsonLinesExporter(TRACE_FILE))
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import update, bindparam, case, func
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from models import AccessKey
+
+# Write-behind tracking of access key usage.
+#
+# get_credentials only records the lookup in memory. Lookups are coalesced per
+# key (count + latest timestamp) and written by a background task with one
+# batched UPDATE per flush interval, instead of one write per authentication.
+
+FLUSH_INTERVAL = float(os.getenv("ACL_USAGE_FLUSH_INTERVAL", "30"))
+
+_credentials = AccessKey.__table__
+
+_FLUSH_STATEMENT = (
+    update(_credentials)
+    .where(_credentials.c.access_access_key_id == bindparam("key_id"))
+    .values(
+        use_count=func.coalesce(_credentials.c.use_count, 0) + bindparam("uses"),
+        # Workers flush independently; never move last_used_at backwards
+        last_used_at=case(
+            (_credentials.c.last_used_at > bindparam("used_at"), _credentials.c.last_used_at),
+            else_=bindparam("used_at")
+        ),
+    )
+)
+
+class UsageTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[int]] = {} # key id -> [uses, last used]
+
+    def record(self, access_key_id: str, used_at: Optional[int] = None):
+        used_at = used_at or int(time.time())
+        with self._lock:
+            entry = self._pending.get(access_key_id)
+            if entry is None:
+                self._pending[access_key_id] = [1, used_at]
+            else:
+                entry[0] += 1
+                entry[1] = max(entry[1], used_at)
+
+    def _drain(self) -> Dict[str, List[int]]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _restore(self, pending: Dict[str, List[int]]):
+        with self._lock:
+            for key_id, (uses, used_at) in pending.items():
+                entry = self._pending.setdefault(key_id, [0, used_at])
+                entry[0] += uses
+                entry[1] = max(entry[1], used_at)
+
+    def flush(self, engine: Engine) -> int:
+        """Writes buffered usage in one batched UPDATE. Returns the number of keys written."""
+        pending = self._drain()
+        if not pending:
+            return 0
+
+        rows = [{"key_id": k, "uses": uses, "used_at": used_at} for k, (uses, used_at) in pending.items()]
+        try:
+            with engine.begin() as conn:
+                conn.execute(_FLUSH_STATEMENT, rows)
+        except Exception:
+            # Keep the counts for the next attempt
+            self._restore(pending)
+            raise
+        return len(rows)
+
+tracker = UsageTracker()
+
+async def run_flusher(engine: Engine, interval: float = FLUSH_INTERVAL):
+    """Background task started by the app lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(tracker.flush, engine)
+        except Exception as e:
+            print(f"Failed to flush credential usage: {e}")
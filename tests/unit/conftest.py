@@ -15,6 +15,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../a
 from database import Base, get_db
 from main import app
 import security
+import shared_cache
+import resource_index
 
 # Setup In-Memory SQLite for Tests
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -43,6 +45,15 @@ def db_session():
     transaction.rollback()
     connection.close()
 
+@pytest.fixture(autouse=True)
+def clear_shared_caches():
+    """Cached entries must not outlive the rolled-back test database"""
+    shared_cache.credentials.clear()
+    shared_cache.effective_policies.clear()
+    shared_cache.identities.clear()
+    resource_index.index.invalidate()
+    yield
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """
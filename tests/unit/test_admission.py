@@ -0,0 +1,70 @@
+import pytest
+import asyncio
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from fastapi.testclient import TestClient
+import admission
+from admission import AdmissionController, AdmissionMiddleware, CREDENTIALS, POLICY_READS, ADMIN
+
+def _controller(total=1, limit=1, queue=4, timeout=1.0):
+    return AdmissionController(
+        total=total,
+        limits={c: limit for c in admission.PRIORITY},
+        queues={c: queue for c in admission.PRIORITY},
+        queue_timeout=timeout,
+    )
+
+def test_classify():
+    assert admission.classify("GET", "/api/v1/auth/credentials/AKIA123") == CREDENTIALS
+    assert admission.classify("GET", "/api/v1/auth/users/alice") == CREDENTIALS
+    assert admission.classify("GET", "/api/v1/auth/credentials/AKIA123/bundle") == CREDENTIALS
+    assert admission.classify("GET", "/api/v1/auth/users/alice/policies") == POLICY_READS
+    assert admission.classify("GET", "/api/v1/auth/policies/FSReadAll") == POLICY_READS
+    assert admission.classify("GET", "/api/v1/auth/users") == ADMIN
+    assert admission.classify("DELETE", "/api/v1/auth/users/alice") == ADMIN
+    assert admission.classify("GET", "/api/v1/healthcheck") is None
+    assert admission.classify("POST", "/api/v1/debug/profile") is None
+
+async def test_credentials_admitted_before_admin():
+    controller = _controller(total=1)
+    assert await controller.acquire(ADMIN)
+
+    order = []
+    async def waiter(cls):
+        assert await controller.acquire(cls)
+        order.append(cls)
+        controller.release(cls)
+
+    admin_task = asyncio.create_task(waiter(ADMIN))
+    await asyncio.sleep(0)
+    cred_task = asyncio.create_task(waiter(CREDENTIALS))
+    await asyncio.sleep(0)
+
+    controller.release(ADMIN)
+    await asyncio.gather(admin_task, cred_task)
+    assert order == [CREDENTIALS, ADMIN]
+    assert controller.in_flight == 0
+
+async def test_full_queue_and_timeout_are_shed():
+    controller = _controller(total=1, queue=1, timeout=0.05)
+    assert await controller.acquire(ADMIN)
+
+    queued = asyncio.create_task(controller.acquire(ADMIN))
+    await asyncio.sleep(0)
+    # Queue is full: rejected immediately
+    assert await controller.acquire(ADMIN) is False
+    # Queued request times out
+    assert await queued is False
+    assert controller.rejected[ADMIN] == 2
+
+    controller.release(ADMIN)
+    assert controller.in_flight == 0
+
+def test_middleware_returns_503_with_retry_after():
+    app = Starlette(routes=[Route("/api/v1/auth/users", lambda request: PlainTextResponse("ok"))])
+    app.add_middleware(AdmissionMiddleware, controller=_controller(limit=0, queue=0))
+
+    response = TestClient(app).get("/api/v1/auth/users")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == admission.RETRY_AFTER
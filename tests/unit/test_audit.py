@@ -0,0 +1,124 @@
+import pytest
+from sqlalchemy import create_engine, select
+from models import AuditEvent, Policy
+from migrations import run_migrations
+import audit
+import time
+
+@pytest.fixture
+def writer(monkeypatch):
+    """Fresh audit queue per test"""
+    fresh = audit.AuditWriter(maxsize=100)
+    monkeypatch.setattr(audit, "writer", fresh)
+    return fresh
+
+def _queued(writer):
+    return list(writer._queue)
+
+def test_diff_keeps_only_changed_fields():
+    before, after = audit.diff({"a": 1, "b": 2}, {"a": 1, "b": 3, "c": 4})
+    assert before == {"b": 2}
+    assert after == {"b": 3, "c": 4}
+    assert audit.diff({"a": 1}, {"a": 1}) == (None, None)
+
+def test_mutations_are_queued_after_commit(client, writer, auth_headers):
+    headers = dict(auth_headers, **{"X-Audit-Actor": "provisioner"})
+    client.post("/api/v1/auth/users", headers=headers, json={"username": "erin", "encryptedPassword": "hash"})
+    client.put("/api/v1/auth/users/erin/friendly_name", headers=headers, json={"friendly_name": "Erin"})
+
+    events = _queued(writer)
+    assert [e["action"] for e in events] == ["create_user", "update_user_friendly_name"]
+    assert all(e["actor"] == "provisioner" for e in events)
+    assert events[0]["after"]["encryptedPassword"] == audit.REDACTED
+    assert events[1]["before"] == {"friendly_name": "erin"}
+    assert events[1]["after"] == {"friendly_name": "Erin"}
+
+def test_failed_batch_is_not_audited(client, writer, auth_headers):
+    client.post("/api/v1/auth/batch", headers=auth_headers, json={"operations": [
+        {"op": "create_user", "body": {"username": "frank"}},
+        {"op": "delete_group", "path": {"groupId": "missing"}},
+    ]})
+    assert _queued(writer) == []
+
+def test_queue_overflow_is_counted():
+    writer = audit.AuditWriter(maxsize=1)
+    writer.enqueue({"action": "a"})
+    writer.enqueue({"action": "b"})
+    assert writer.stats["enqueued"] == 1
+    assert writer.stats["dropped"] == 1
+
+def test_drain_writes_multi_row_batches(writer):
+    engine = create_engine("sqlite:///:memory:")
+    run_migrations(engine)
+    for i in range(3):
+        writer.enqueue({
+            "created_at": i, "actor": "x", "action": "create_user",
+            "target_type": "user", "target_id": f"u{i}", "before": None, "after": {"email": None}
+        })
+
+    assert writer.drain(engine) == 3
+    with engine.connect() as conn:
+        assert conn.execute(select(AuditEvent.target_id).order_by(AuditEvent.id)).scalars().all() == ["u0", "u1", "u2"]
+    engine.dispose()
+
+def test_failed_drain_requeues_events(writer):
+    for i in range(3):
+        writer.enqueue({
+            "created_at": i, "actor": "x", "action": "create_user",
+            "target_type": "user", "target_id": f"u{i}", "before": None, "after": None
+        })
+    broken = create_engine("sqlite:///:memory:") # no acl_audit table
+    assert writer.drain(broken) == 0
+    assert [e["target_id"] for e in _queued(writer)] == ["u0", "u1", "u2"]
+    assert writer.stats["dropped"] == 0
+
+    engine = create_engine("sqlite:///:memory:")
+    run_migrations(engine)
+    writer.enqueue({
+        "created_at": 3, "actor": "x", "action": "create_user",
+        "target_type": "user", "target_id": "u3", "before": None, "after": None
+    })
+    assert writer.drain(engine) == 4
+    with engine.connect() as conn:
+        assert conn.execute(select(AuditEvent.target_id).order_by(AuditEvent.id)).scalars().all() == ["u0", "u1", "u2", "u3"]
+    engine.dispose()
+    broken.dispose()
+
+def test_requeue_is_bounded_by_queue_size():
+    writer = audit.AuditWriter(maxsize=2)
+    writer._restore([{"action": "a"}, {"action": "b"}, {"action": "c"}])
+    assert [e["action"] for e in _queued(writer)] == ["a", "b"]
+    assert writer.stats["dropped"] == 1
+
+def test_list_audit_events_keyset_pagination(client, db_session, auth_headers):
+    for i in range(5):
+        db_session.add(AuditEvent(
+            created_at=int(time.time()), actor="x", action="delete_policy" if i % 2 else "create_policy",
+            target_type="policy", target_id=f"p{i}"
+        ))
+    db_session.commit()
+
+    page = client.get("/api/v1/audit?amount=2&action=create_policy", headers=auth_headers).json()
+    assert [e["target_id"] for e in page["results"]] == ["p0", "p2"]
+    assert page["pagination"]["has_more"] is True
+
+    after = page["pagination"]["next_offset"]
+    page = client.get(f"/api/v1/audit?amount=2&action=create_policy&after={after}", headers=auth_headers).json()
+    assert [e["target_id"] for e in page["results"]] == ["p4"]
+    assert page["pagination"]["has_more"] is False
+
+def test_shutdown_drains_audit_events_when_usage_flush_fails(monkeypatch):
+    import main
+    import usage
+    from fastapi.testclient import TestClient
+
+    def failing_flush(engine):
+        raise RuntimeError("database is locked")
+
+    drained = []
+    monkeypatch.setattr(main, "initialize_database", lambda engine: True)
+    monkeypatch.setattr(usage.tracker, "flush", failing_flush)
+    monkeypatch.setattr(audit.writer, "drain", drained.append)
+    with TestClient(main.app):
+        pass
+    assert drained == [main.engine]
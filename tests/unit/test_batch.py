@@ -0,0 +1,55 @@
+import pytest
+from models import User, Group, AccessKey
+import security
+import time
+
+def test_batch_applies_all_operations(client, db_session, auth_headers):
+    """Verify a batch runs every operation and reports per-operation results"""
+    db_session.add(Group(id="Developers", created_at=int(time.time())))
+    db_session.commit()
+
+    response = client.post(
+        "/api/v1/auth/batch",
+        headers=auth_headers,
+        json={"operations": [
+            {"op": "create_user", "body": {"username": "alice"}},
+            {"op": "add_group_membership", "path": {"groupId": "Developers", "userId": "alice"}},
+            {"op": "create_credentials", "path": {"userId": "alice"}, "body": {"access_key_id": "AKALICE"}},
+        ]}
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == [201, 201, 201]
+    assert results[0]["result"]["username"] == "alice"
+    assert results[2]["result"]["access_key_id"] == "AKALICE"
+
+    user = db_session.query(User).filter(User.id == "alice").first()
+    assert [g.id for g in user.groups] == ["Developers"]
+    cred = db_session.query(AccessKey).filter(AccessKey.access_access_key_id == "AKALICE").first()
+    assert security.decrypt_secret(cred.access_secret_access_key) == results[2]["result"]["secret_access_key"]
+
+def test_batch_is_all_or_nothing(client, db_session, auth_headers):
+    """Verify a failing operation rolls back the whole batch"""
+    response = client.post(
+        "/api/v1/auth/batch",
+        headers=auth_headers,
+        json={"operations": [
+            {"op": "create_user", "body": {"username": "bob"}},
+            {"op": "add_group_membership", "path": {"groupId": "Missing", "userId": "bob"}},
+        ]}
+    )
+
+    assert response.status_code == 404
+    detail = response.json()["detail"]
+    assert detail["index"] == 1
+    assert detail["op"] == "add_group_membership"
+    assert db_session.query(User).filter(User.id == "bob").first() is None
+
+def test_batch_rejects_unknown_operation(client, auth_headers):
+    response = client.post(
+        "/api/v1/auth/batch",
+        headers=auth_headers,
+        json={"operations": [{"op": "drop_everything"}]}
+    )
+    assert response.status_code == 400
@@ -64,3 +64,84 @@ def test_create_credentials_user_not_found(client, db_session, valid_token):
         headers=headers
     )
     assert response.status_code == 404
+
+def test_usage_is_coalesced_and_flushed():
+    """Lookups are buffered per key and written in one batched update"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from migrations import run_migrations
+    from usage import UsageTracker
+
+    engine = create_engine("sqlite:///:memory:")
+    run_migrations(engine)
+    with Session(bind=engine) as db:
+        db.add(User(id="testuser", created_at=1))
+        db.add(AccessKey(access_access_key_id="AK1", access_secret_access_key="x", user_id="testuser", created_at=1))
+        db.add(AccessKey(access_access_key_id="AK2", access_secret_access_key="x", user_id="testuser", created_at=1))
+        db.commit()
+
+    tracker = UsageTracker()
+    tracker.record("AK1", used_at=100)
+    tracker.record("AK1", used_at=200)
+    tracker.record("AK2", used_at=150)
+    assert tracker.flush(engine) == 2
+    assert tracker.flush(engine) == 0
+
+    # An older timestamp from another worker does not move last_used_at back
+    tracker.record("AK1", used_at=50)
+    tracker.flush(engine)
+
+    with Session(bind=engine) as db:
+        ak1 = db.get(AccessKey, "AK1")
+        ak2 = db.get(AccessKey, "AK2")
+        assert (ak1.use_count, ak1.last_used_at) == (3, 200)
+        assert (ak2.use_count, ak2.last_used_at) == (1, 150)
+    engine.dispose()
+
+def test_credentials_expose_usage(client, db_session, valid_token):
+    user = User(id="testuser", created_at=int(time.time()))
+    cred = AccessKey(
+        access_access_key_id="AKUSED",
+        access_secret_access_key=security.encrypt_secret("s"),
+        user_id="testuser",
+        created_at=int(time.time()),
+        last_used_at=1700000000,
+        use_count=42
+    )
+    db_session.add_all([user, cred])
+    db_session.commit()
+
+    headers = {"Authorization": f"Bearer {valid_token}"}
+    data = client.get("/api/v1/auth/users/testuser/credentials", headers=headers).json()
+    assert data["results"][0]["last_used_date"] == 1700000000
+    assert data["results"][0]["use_count"] == 42
+
+def test_credentials_bundle(client, db_session, auth_headers):
+    """Key, user, groups and effective policies in one response"""
+    user = User(id="bundled", created_at=int(time.time()), email="b@example.com")
+    cred = AccessKey(
+        access_access_key_id="AKBUNDLE",
+        access_secret_access_key=security.encrypt_secret("bundle-secret"),
+        user_id="bundled",
+        created_at=int(time.time())
+    )
+    db_session.add_all([user, cred])
+    db_session.commit()
+
+    statement = [{"effect": "allow", "resource": "*", "action": ["fs:Read*"]}]
+    for policy_id in ["Direct", "ViaGroup"]:
+        client.post("/api/v1/auth/policies", headers=auth_headers, json={"name": policy_id, "statement": statement})
+    client.post("/api/v1/auth/groups", headers=auth_headers, json={"id": "readers"})
+    client.put("/api/v1/auth/groups/readers/members/bundled", headers=auth_headers)
+    client.put("/api/v1/auth/groups/readers/policies/ViaGroup", headers=auth_headers)
+    client.put("/api/v1/auth/users/bundled/policies/Direct", headers=auth_headers)
+
+    data = client.get("/api/v1/auth/credentials/AKBUNDLE/bundle", headers=auth_headers).json()
+    assert data["credentials"]["secret_access_key"] == "bundle-secret"
+    assert data["credentials"]["user_name"] == "bundled"
+    assert data["user"]["email"] == "b@example.com"
+    assert data["groups"] == ["readers"]
+    assert [p["name"] for p in data["policies"]] == ["Direct", "ViaGroup"]
+    assert data["policies"][0]["statement"][0]["action"] == ["fs:Read*"]
+
+    assert client.get("/api/v1/auth/credentials/AKNONE/bundle", headers=auth_headers).status_code == 404
@@ -0,0 +1,80 @@
+import threading
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+import database
+import audit
+from main import app
+
+@pytest.fixture
+def embedded(tmp_path):
+    url = f"sqlite:///{tmp_path / 'acl.db'}"
+    engine, read_engine = database.create_engines(url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+    yield engine, read_engine
+    engine.dispose()
+    read_engine.dispose()
+
+def test_in_memory_sqlite_shares_one_engine():
+    assert not database.is_embedded_sqlite("sqlite:///:memory:")
+    assert not database.is_embedded_sqlite("sqlite://")
+    engine, read_engine = database.create_engines("sqlite:///:memory:")
+    assert engine is read_engine
+
+def test_embedded_pragmas(embedded):
+    engine, read_engine = embedded
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1 # NORMAL
+        assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+def test_readers_are_query_only(embedded):
+    engine, read_engine = embedded
+    with read_engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("INSERT INTO t (id) VALUES (1)"))
+
+def test_writers_queue_for_the_single_connection(embedded):
+    engine, read_engine = embedded
+
+    def insert(start):
+        for i in range(start, start + 50):
+            with engine.begin() as conn:
+                conn.execute(text("INSERT INTO t (id) VALUES (:id)"), {"id": i})
+
+    threads = [threading.Thread(target=insert, args=(n * 100,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    # Readers are not blocked by the writer
+    with read_engine.connect() as conn:
+        conn.execute(text("SELECT count(*) FROM t")).scalar()
+    for t in threads:
+        t.join()
+    with read_engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 200
+
+def test_maintenance(embedded):
+    engine, read_engine = embedded
+    database.sqlite_maintenance(engine, vacuum=True)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 0
+
+def test_embedded_get_creates_default_group(embedded, monkeypatch, auth_headers):
+    """The default groups are created on GET even though GET requests only get a reader"""
+    engine, read_engine = embedded
+    database.Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autoflush=False, bind=engine))
+    monkeypatch.setattr(database, "ReadSessionLocal", sessionmaker(autoflush=False, bind=read_engine))
+    client = TestClient(app)
+
+    response = client.get("/api/v1/auth/groups/Admins", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == "Admins"
+    assert client.get("/api/v1/auth/groups/Admins", headers=auth_headers).status_code == 200
+    assert client.get("/api/v1/auth/groups/Nobody", headers=auth_headers).status_code == 404
+    with read_engine.connect() as conn:
+        assert conn.execute(text("SELECT id FROM auth_groups")).scalars().all() == ["Admins"]
+    audit.writer.drain(engine)
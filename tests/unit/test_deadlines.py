@@ -0,0 +1,38 @@
+import sqlite3
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+import admission
+import deadlines
+import repository
+
+SLOW_QUERY = text("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) SELECT count(*) FROM c")
+
+def test_route_classes():
+    assert deadlines.route_class("GET", "/api/v1/auth/credentials/AK") == admission.CREDENTIALS
+    assert deadlines.route_class("GET", "/api/v1/auth/users") == admission.ADMIN
+    assert deadlines.route_class("GET", "/api/v1/reports/access_matrix") == deadlines.EXPORT
+    assert deadlines.route_class("GET", "/api/v1/healthcheck") is None
+
+def test_sqlite_statement_interrupted_at_deadline():
+    with Session(create_engine("sqlite://")) as db:
+        deadlines.set_deadline(db, 50)
+        start = time.monotonic()
+        with pytest.raises(OperationalError) as e:
+            db.execute(SLOW_QUERY)
+        assert time.monotonic() - start < 2
+        assert deadlines.is_timeout(e.value)
+        db.rollback()
+
+        # The interrupt handler goes away with the transaction
+        del db.info["deadline"]
+        assert db.execute(text("SELECT 1")).scalar() == 1
+
+def test_deadline_exceeded_returns_504(client, auth_headers, monkeypatch):
+    def interrupted(db, user_id):
+        raise OperationalError("SELECT", {}, sqlite3.OperationalError("interrupted"))
+    monkeypatch.setattr(repository, "get_user", interrupted)
+    response = client.get("/api/v1/auth/users/someone", headers=auth_headers)
+    assert response.status_code == 504
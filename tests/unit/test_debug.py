@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+import pytest
+from sqlalchemy import event
+import profiler
+import security
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    monkeypatch.setattr(security, "ADMIN_TOKEN", "admin-token")
+    return {"Authorization": "Bearer admin-token"}
+
+def test_debug_requires_admin_token(client, auth_headers, monkeypatch):
+    assert client.post("/api/v1/debug/profile?seconds=0.01", headers=auth_headers).status_code == 403
+    monkeypatch.setattr(security, "ADMIN_TOKEN", "admin-token")
+    assert client.post("/api/v1/debug/profile?seconds=0.01", headers=auth_headers).status_code == 403
+
+def _busy_endpoint(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_sample_attributes_stacks_to_routes():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_endpoint, args=(stop,))
+    worker.start()
+    try:
+        stacks = profiler.sample(0.1, 200, {_busy_endpoint.__code__: "/api/v1/busy/{id}"})
+    finally:
+        stop.set()
+        worker.join()
+
+    busy = [s for s in stacks if s.startswith("/api/v1/busy/{id};")]
+    assert busy
+    assert all("_busy_endpoint (test_debug.py:" in s for s in busy)
+    assert profiler.collapsed(stacks).splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+def test_every_debug_response_names_the_worker(client, auth_headers, admin_headers):
+    for response in [
+        client.get("/api/v1/debug/memory", headers=admin_headers),
+        client.delete("/api/v1/debug/slow_queries", headers=admin_headers),
+        client.get("/api/v1/debug/memory/diff?base=x", headers=admin_headers),
+        client.get("/api/v1/debug/memory", headers=auth_headers),
+    ]:
+        assert response.headers["x-worker-pid"] == str(os.getpid())
+
+def test_profile_endpoint(client, admin_headers):
+    response = client.post("/api/v1/debug/profile?seconds=0.05&hz=200", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["x-worker-pid"]
+
+def test_memory_snapshots_and_diff(client, admin_headers):
+    assert client.post("/api/v1/debug/memory/snapshots", headers=admin_headers).status_code == 409
+
+    client.post("/api/v1/debug/memory/start", headers=admin_headers)
+    try:
+        base = client.post("/api/v1/debug/memory/snapshots", headers=admin_headers).json()["snapshot"]
+        retained = [bytearray(1024) for _ in range(1000)]
+        target = client.post("/api/v1/debug/memory/snapshots", headers=admin_headers).json()
+        assert target["modules"] and target["sites"]
+
+        diff = client.get(f"/api/v1/debug/memory/diff?base={base}&target={target['snapshot']}", headers=admin_headers).json()
+        assert diff["sites"][0]["site"].startswith("test_debug.py:")
+        assert diff["modules"][0]["module"] == "test_debug.py"
+        missing = client.get(f"/api/v1/debug/memory/diff?base={base}&target={os.getpid()}-0", headers=admin_headers)
+        assert missing.status_code == 404
+        assert missing.headers["x-worker-pid"] == str(os.getpid())
+
+        # Snapshots taken by another worker
+        other = client.get(f"/api/v1/debug/memory/snapshots/1-{base.split('-')[1]}", headers=admin_headers)
+        assert other.status_code == 409
+        assert "worker 1," in other.json()["detail"]
+    finally:
+        client.post("/api/v1/debug/memory/stop", headers=admin_headers)
+    del retained
+
+def test_module_of():
+    import memtrace, os
+    assert memtrace.module_of(os.path.join(memtrace._ROOT, "routers", "users.py")) == os.path.join("routers", "users.py")
+    assert memtrace.module_of("/usr/lib/python3.10/site-packages/sqlalchemy/orm/session.py") == "sqlalchemy"
+    assert memtrace.module_of(os.path.join(memtrace._STDLIB, "json", "decoder.py")) == os.path.join("stdlib/json", "decoder")
+
+def test_slow_query_log(client, db_session, auth_headers, admin_headers, monkeypatch):
+    import slow_queries
+    monkeypatch.setattr(slow_queries, "THRESHOLD_MS", 0)
+    engine = db_session.bind.engine
+    slow_queries.install(engine)
+    try:
+        client.delete("/api/v1/debug/slow_queries", headers=admin_headers)
+        client.get("/api/v1/auth/users?prefix=al", headers=auth_headers)
+        entries = client.get("/api/v1/debug/slow_queries", headers=admin_headers).json()["results"]
+    finally:
+        event.remove(engine, "before_cursor_execute", slow_queries._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", slow_queries._after_cursor_execute)
+        event.remove(engine, "handle_error", slow_queries._handle_error)
+
+    select = next(e for e in entries if e["statement"].lstrip().startswith("SELECT") and "auth_users" in e["statement"])
+    assert select["route"] == "/api/v1/auth/users"
+    # Values are never recorded, only their types
+    assert "al%" not in str(select["params"]) and "str" in select["params"]
+    assert select["plan"]
+
+def test_failed_explain_rolls_back_to_savepoint(monkeypatch):
+    import slow_queries
+
+    class Cursor:
+        def __init__(self):
+            self.executed = []
+        def execute(self, sql, parameters=None):
+            self.executed.append(sql)
+            if sql.startswith("EXPLAIN"):
+                raise RuntimeError("canceling statement due to statement timeout")
+        def close(self):
+            pass
+
+    class Conn:
+        class dialect:
+            name = "postgresql"
+        class connection:
+            cursor_ = Cursor()
+            @classmethod
+            def cursor(cls):
+                return cls.cursor_
+
+    monkeypatch.setattr(slow_queries, "EXPLAIN", "analyze")
+    plan = slow_queries._explain(Conn, "SELECT 1", {})
+    assert plan[0].startswith("EXPLAIN failed")
+    assert Conn.connection.cursor_.executed == [
+        "SAVEPOINT slow_query_explain",
+        "EXPLAIN ANALYZE SELECT 1",
+        "ROLLBACK TO SAVEPOINT slow_query_explain",
+        "RELEASE SAVEPOINT slow_query_explain",
+    ]
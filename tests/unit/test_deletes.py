@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import event, select, func
+from models import User, Group, Policy, AccessKey, user_groups, group_policies, user_policies
+import time
+
+@pytest.fixture
+def populated(db_session):
+    policy = Policy(id="p1", statement=[], created_at=int(time.time()))
+    group = Group(id="g1", created_at=int(time.time()), policies=[policy])
+    users = []
+    for i in range(20):
+        user = User(id=f"user{i:02d}", created_at=int(time.time()), groups=[group], policies=[policy])
+        user.access_keys = [AccessKey(access_access_key_id=f"AK{i:02d}{k}", access_secret_access_key="x") for k in range(5)]
+        users.append(user)
+    db_session.add_all(users)
+    db_session.commit()
+    db_session.expunge_all()
+    return db_session
+
+def _count(db_session, table, **filters):
+    query = select(func.count()).select_from(table)
+    for column, value in filters.items():
+        query = query.where(table.c[column] == value)
+    return db_session.execute(query).scalar()
+
+@pytest.fixture
+def statements(populated):
+    """Records SQL statements issued after the fixture data is in place"""
+    recorded = []
+    def record(conn, cursor, statement, *args):
+        recorded.append(statement)
+    engine = populated.get_bind().engine
+    event.listen(engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(engine, "before_cursor_execute", record)
+
+def test_delete_user_cascades(client, populated, statements, auth_headers):
+    """Deleting a user removes keys, memberships and attachments without loading them"""
+    response = client.delete("/api/v1/auth/users/user00", headers=auth_headers)
+    assert response.status_code == 204
+    assert len(statements) <= 2
+
+    assert _count(populated, AccessKey.__table__, user_id="user00") == 0
+    assert _count(populated, user_groups, user_id="user00") == 0
+    assert _count(populated, user_policies, user_id="user00") == 0
+    assert _count(populated, AccessKey.__table__) == 95
+
+def test_delete_group_cascades(client, populated, statements, auth_headers):
+    response = client.delete("/api/v1/auth/groups/g1", headers=auth_headers)
+    assert response.status_code == 204
+    assert len(statements) <= 2
+
+    assert _count(populated, user_groups) == 0
+    assert _count(populated, group_policies) == 0
+    assert _count(populated, User.__table__) == 20
+
+def test_delete_policy_cascades(client, populated, statements, auth_headers):
+    response = client.delete("/api/v1/auth/policies/p1", headers=auth_headers)
+    assert response.status_code == 204
+    assert len(statements) <= 2
+
+    assert _count(populated, group_policies) == 0
+    assert _count(populated, user_policies) == 0
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+import init_db
+from models import Group, Policy, group_policies
+
+@pytest.fixture
+def fresh_engine():
+    engine = create_engine("sqlite:///:memory:")
+    yield engine
+    engine.dispose()
+
+def _count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+def test_initialize_seeds_fresh_database(fresh_engine):
+    assert init_db.initialize_database(fresh_engine) is True
+
+    with Session(bind=fresh_engine) as db:
+        assert set(db.scalars(select(Policy.id))) == {p["id"] for p in init_db.POLICIES_DATA}
+        assert set(db.scalars(select(Group.id))) == set(init_db.GROUPS_DATA)
+        admins = db.get(Group, "Admins")
+        assert {p.id for p in admins.policies} == set(init_db.GROUPS_DATA["Admins"])
+
+def test_initialize_is_a_single_query_when_unchanged(fresh_engine):
+    init_db.initialize_database(fresh_engine)
+    init_db._initialized.clear() # simulate a restart
+
+    statements = _count_statements(fresh_engine)
+    assert init_db.initialize_database(fresh_engine) is False
+    assert len(statements) == 1
+
+def test_initialize_runs_once_per_process(fresh_engine):
+    """Workers forked from an initialized parent issue no queries at all"""
+    init_db.initialize_database(fresh_engine)
+
+    statements = _count_statements(fresh_engine)
+    assert init_db.initialize_database(fresh_engine) is False
+    assert statements == []
+
+def test_initialize_applies_seed_changes(fresh_engine, monkeypatch):
+    init_db.initialize_database(fresh_engine)
+
+    groups = dict(init_db.GROUPS_DATA, Viewers=init_db.GROUPS_DATA["Viewers"] + ["RepoManagementReadAll"])
+    monkeypatch.setattr(init_db, "GROUPS_DATA", groups)
+    init_db._initialized.clear() # simulate a restart
+
+    assert init_db.initialize_database(fresh_engine) is True
+    with Session(bind=fresh_engine) as db:
+        links = set(db.execute(
+            select(group_policies.c.policy_id).where(group_policies.c.group_id == "Viewers")
+        ).scalars())
+    assert links == {"FSReadAll", "AuthManageOwnCredentials", "RepoManagementReadAll"}
+
+def test_initialize_waits_for_lock_holder(tmp_path, monkeypatch):
+    """A replica that cannot get the init lock gives up after the timeout"""
+    import locks
+    engine = create_engine(f"sqlite:///{tmp_path / 'acl.db'}")
+    monkeypatch.setattr(init_db, "INIT_LOCK_TIMEOUT", 0.2)
+    monkeypatch.setattr(locks, "POLL_INTERVAL", 0.05)
+
+    with locks.init_lock(engine):
+        with pytest.raises(TimeoutError):
+            init_db.initialize_database(engine)
+
+    assert init_db.initialize_database(engine) is True
+    assert init_db.initialize_database(engine) is False
+    engine.dispose()
@@ -0,0 +1,114 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+import migrations
+from models import User, Group
+
+@pytest.fixture
+def fresh_engine():
+    engine = create_engine("sqlite:///:memory:")
+    yield engine
+    engine.dispose()
+
+def _index_names(engine, table):
+    return {i["name"] for i in inspect(engine).get_indexes(table)}
+
+def test_migrations_on_fresh_database(fresh_engine):
+    """A fresh database ends up at the latest version with all indexes"""
+    assert migrations.run_migrations(fresh_engine) == migrations.SCHEMA_VERSION
+
+    with fresh_engine.connect() as conn:
+        assert migrations.get_schema_version(conn) == migrations.SCHEMA_VERSION
+
+    assert "ix_auth_credentials_user_id_key" in _index_names(fresh_engine, "auth_credentials")
+    assert "ix_auth_user_groups_group_id_user_id" in _index_names(fresh_engine, "auth_user_groups")
+    assert {"ix_auth_users_email_not_null", "ix_auth_users_external_id_not_null"} <= _index_names(fresh_engine, "auth_users")
+    # Pattern-ops indexes are Postgres only
+    assert "ix_auth_users_id_pattern" not in _index_names(fresh_engine, "auth_users")
+
+def test_migrations_are_idempotent(fresh_engine):
+    migrations.run_migrations(fresh_engine)
+    migrations.run_migrations(fresh_engine)
+
+    with fresh_engine.connect() as conn:
+        rows = conn.execute(text("SELECT version FROM acl_schema_version ORDER BY version")).scalars().all()
+    assert rows == [v for v, _, _ in migrations.MIGRATIONS]
+
+def test_migrations_add_indexes_to_existing_database(fresh_engine):
+    """Databases created by create_all before migrations existed get the new indexes"""
+    migrations.run_migrations(fresh_engine)
+    with fresh_engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_auth_users_email_not_null"))
+        conn.execute(text("DROP TABLE acl_schema_version"))
+
+    migrations.run_migrations(fresh_engine)
+    assert "ix_auth_users_email_not_null" in _index_names(fresh_engine, "auth_users")
+
+# Schema written by create_all before migrations existed: no ON DELETE CASCADE
+BASELINE_SCHEMA = [
+    "CREATE TABLE auth_users (id VARCHAR NOT NULL PRIMARY KEY, friendly_name VARCHAR, created_at BIGINT, "
+    "email VARCHAR, source VARCHAR, encrypted_password VARCHAR, external_id VARCHAR)",
+    "CREATE INDEX ix_auth_users_id ON auth_users (id)",
+    "CREATE TABLE auth_groups (id VARCHAR NOT NULL PRIMARY KEY, description VARCHAR, created_at BIGINT)",
+    "CREATE INDEX ix_auth_groups_id ON auth_groups (id)",
+    "CREATE TABLE auth_policies (id VARCHAR NOT NULL PRIMARY KEY, description VARCHAR, created_at BIGINT, "
+    "statement JSON, acl VARCHAR)",
+    "CREATE INDEX ix_auth_policies_id ON auth_policies (id)",
+    "CREATE TABLE auth_user_groups (user_id VARCHAR NOT NULL REFERENCES auth_users (id), "
+    "group_id VARCHAR NOT NULL REFERENCES auth_groups (id), created_at BIGINT, PRIMARY KEY (user_id, group_id))",
+    "CREATE TABLE auth_group_policies (group_id VARCHAR NOT NULL REFERENCES auth_groups (id), "
+    "policy_id VARCHAR NOT NULL REFERENCES auth_policies (id), created_at BIGINT, PRIMARY KEY (group_id, policy_id))",
+    "CREATE TABLE auth_user_policies (user_id VARCHAR NOT NULL REFERENCES auth_users (id), "
+    "policy_id VARCHAR NOT NULL REFERENCES auth_policies (id), created_at BIGINT, PRIMARY KEY (user_id, policy_id))",
+    "CREATE TABLE auth_credentials (access_access_key_id VARCHAR NOT NULL PRIMARY KEY, "
+    "access_secret_access_key VARCHAR, user_id VARCHAR REFERENCES auth_users (id), created_at BIGINT)",
+]
+
+def _baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'acl.db'}")
+    with engine.begin() as conn:
+        for ddl in BASELINE_SCHEMA:
+            conn.execute(text(ddl))
+    return engine
+
+def test_migrations_cascade_baseline_sqlite_database(tmp_path):
+    """Users and groups in a database from before the cascade change can be deleted after upgrading"""
+    engine = _baseline_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO auth_users (id, created_at) VALUES ('alice', 1), ('bob', 1)"))
+        conn.execute(text("INSERT INTO auth_groups (id, created_at) VALUES ('Viewers', 1)"))
+        conn.execute(text("INSERT INTO auth_policies (id, created_at, statement) VALUES ('FSReadAll', 1, '[]')"))
+        conn.execute(text("INSERT INTO auth_user_groups (user_id, group_id) VALUES ('alice', 'Viewers'), ('bob', 'Viewers')"))
+        conn.execute(text("INSERT INTO auth_group_policies (group_id, policy_id) VALUES ('Viewers', 'FSReadAll')"))
+        conn.execute(text("INSERT INTO auth_user_policies (user_id, policy_id) VALUES ('alice', 'FSReadAll')"))
+        conn.execute(text(
+            "INSERT INTO auth_credentials (access_access_key_id, access_secret_access_key, user_id) "
+            "VALUES ('AKIA1', 's1', 'alice'), ('AKIA2', 's2', 'alice'), ('AKIA3', 's3', 'bob')"
+        ))
+
+    migrations.run_migrations(engine)
+
+    with Session(engine) as db:
+        db.delete(db.get(User, "alice"))
+        db.delete(db.get(Group, "Viewers"))
+        db.commit()
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT access_access_key_id FROM auth_credentials")).scalars().all() == ["AKIA3"]
+        assert conn.execute(text("SELECT count(*) FROM auth_user_groups")).scalar() == 0
+        assert conn.execute(text("SELECT count(*) FROM auth_group_policies")).scalar() == 0
+        assert conn.execute(text("SELECT count(*) FROM auth_user_policies")).scalar() == 0
+        # Rebuilt tables get the indexes added since
+        assert "ix_auth_credentials_user_id_key" in _index_names(engine, "auth_credentials")
+        assert "ix_auth_user_groups_group_id_user_id" in _index_names(engine, "auth_user_groups")
+    engine.dispose()
+
+def test_cascade_migration_is_not_recorded_without_cascades(tmp_path, monkeypatch):
+    engine = _baseline_engine(tmp_path)
+    monkeypatch.setattr(migrations, "_rebuild_sqlite_table", lambda conn, table: None)
+
+    with pytest.raises(RuntimeError, match="ON DELETE CASCADE"):
+        migrations.run_migrations(engine)
+    with engine.connect() as conn:
+        assert migrations.get_schema_version(conn) < 2
+    engine.dispose()
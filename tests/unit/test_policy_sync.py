@@ -0,0 +1,55 @@
+import json
+import pytest
+from models import Policy, group_policies
+import policy_sync
+
+READ = [{"effect": "allow", "resource": "*", "action": ["fs:Read*"]}]
+WRITE = [{"effect": "allow", "resource": "*", "action": ["fs:Write*"]}]
+
+@pytest.fixture
+def definitions(tmp_path):
+    (tmp_path / "policies").mkdir()
+    (tmp_path / "policies" / "read.json").write_text(json.dumps({"policies": [{"id": "Read", "statement": READ}]}))
+    (tmp_path / "policies" / "write.yaml").write_text(
+        "policies:\n  - id: Write\n    statement:\n      - {effect: allow, resource: '*', action: ['fs:Write*']}\n"
+    )
+    (tmp_path / "groups.yml").write_text("groups:\n  Readers: [Read]\n  Writers: [Read, Write]\n")
+    return tmp_path
+
+def _links(db_session):
+    return set(db_session.execute(group_policies.select().with_only_columns(group_policies.c.group_id, group_policies.c.policy_id)).tuples())
+
+def test_sync_creates_then_is_a_no_op(db_session, definitions):
+    plan = policy_sync.sync(db_session, str(definitions))
+    assert [p["id"] for p in plan.create_policies] == ["Read", "Write"]
+    assert plan.create_groups == ["Readers", "Writers"]
+    assert _links(db_session) == {("Readers", "Read"), ("Writers", "Read"), ("Writers", "Write")}
+
+    assert policy_sync.sync(db_session, str(definitions)).is_empty()
+
+def test_sync_applies_minimal_diff(db_session, definitions):
+    policy_sync.sync(db_session, str(definitions))
+    db_session.add(Policy(id="Legacy", statement=READ))
+    db_session.commit()
+
+    (definitions / "policies" / "read.json").write_text(json.dumps({"policies": [{"id": "Read", "statement": WRITE}]}))
+    (definitions / "groups.yml").write_text("groups:\n  Readers: [Read]\n  Writers: [Write]\n")
+
+    plan = policy_sync.sync(db_session, str(definitions), dry_run=True, prune=True)
+    assert [p["id"] for p in plan.update_policies] == ["Read"]
+    assert plan.delete_policies == ["Legacy"]
+    assert plan.detach == [("Writers", "Read")]
+    assert not plan.create_policies and not plan.attach
+    # Dry run wrote nothing
+    assert db_session.get(Policy, "Read").statement == READ
+
+    policy_sync.sync(db_session, str(definitions), prune=True)
+    db_session.expire_all()
+    assert db_session.get(Policy, "Read").statement == WRITE
+    assert db_session.get(Policy, "Legacy") is None
+    assert _links(db_session) == {("Readers", "Read"), ("Writers", "Write")}
+
+def test_undefined_policy_reference(tmp_path):
+    (tmp_path / "groups.json").write_text(json.dumps({"groups": {"Readers": ["Missing"]}}))
+    with pytest.raises(ValueError):
+        policy_sync.load_definitions(str(tmp_path))
@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import event
+import compression
+
+STATEMENT = [{"effect": "allow", "action": ["fs:ReadObject"], "resource": "arn:lakefs:fs:::repository/r/*"}]
+
+@pytest.fixture
+def data(client, auth_headers):
+    for name in ["alice", "bob", "carol"]:
+        client.post("/api/v1/auth/users", headers=auth_headers, json={"username": name, "email": f"{name}@example.com"})
+    for name in ["p1", "p2"]:
+        client.post("/api/v1/auth/policies", headers=auth_headers, json={"name": name, "statement": STATEMENT})
+    client.post("/api/v1/auth/groups", headers=auth_headers, json={"id": "devs"})
+    client.put("/api/v1/auth/groups/devs/members/alice", headers=auth_headers)
+    client.put("/api/v1/auth/groups/devs/members/bob", headers=auth_headers)
+    client.put("/api/v1/auth/groups/devs/policies/p2", headers=auth_headers)
+    client.put("/api/v1/auth/users/alice/policies/p1", headers=auth_headers)
+
+def test_list_users_fields(client, auth_headers, data):
+    data = client.get("/api/v1/auth/users?fields=username,email&amount=2", headers=auth_headers).json()
+    assert data["results"] == [
+        {"username": "alice", "email": "alice@example.com"},
+        {"username": "bob", "email": "bob@example.com"},
+    ]
+    assert data["pagination"] == {"has_more": True, "max_per_page": 2, "results": 2, "next_offset": "bob"}
+
+def test_unknown_field(client, auth_headers):
+    response = client.get("/api/v1/auth/users?fields=username,password", headers=auth_headers)
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
+
+def test_list_policies_fields(client, auth_headers, data):
+    names = client.get("/api/v1/auth/policies?fields=name&prefix=p", headers=auth_headers).json()
+    assert names["results"] == [{"name": "p1"}, {"name": "p2"}]
+
+    full = client.get("/api/v1/auth/policies?prefix=p", headers=auth_headers).json()
+    projected = client.get("/api/v1/auth/policies?prefix=p&fields=name,statement", headers=auth_headers).json()
+    assert projected["results"] == [{"name": p["name"], "statement": p["statement"]} for p in full["results"]]
+
+def test_list_groups_and_members_fields(client, auth_headers, data):
+    groups = client.get("/api/v1/auth/groups?fields=id&prefix=devs", headers=auth_headers).json()
+    assert groups["results"] == [{"id": "devs"}]
+
+    members = client.get("/api/v1/auth/groups/devs/members?fields=username", headers=auth_headers).json()
+    assert members["results"] == [{"username": "alice"}, {"username": "bob"}]
+    assert members["pagination"]["next_offset"] == "bob"
+
+def test_list_user_policies_fields(client, auth_headers, data):
+    url = "/api/v1/auth/users/alice/policies?effective=true&fields=name"
+    assert client.get(url, headers=auth_headers).json()["results"] == [{"name": "p1"}, {"name": "p2"}]
+
+def _selects(db_session, url, client, auth_headers):
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement) if statement.lstrip().startswith("SELECT") else None
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    try:
+        data = client.get(url, headers=auth_headers).json()
+    finally:
+        event.remove(db_session.bind, "before_cursor_execute", listener)
+    return data, statements
+
+def test_member_and_direct_policy_fields_are_selected_in_sql(client, db_session, auth_headers, data):
+    members, selects = _selects(db_session, "/api/v1/auth/groups/devs/members?fields=username&after=alice&amount=1", client, auth_headers)
+    assert members["results"] == [{"username": "bob"}]
+    query = next(s for s in selects if "auth_user_groups" in s)
+    assert "LIMIT" in query and "auth_users.email" not in query
+
+    policies, selects = _selects(db_session, "/api/v1/auth/users/alice/policies?fields=name&prefix=p", client, auth_headers)
+    assert policies["results"] == [{"name": "p1"}]
+    query = next(s for s in selects if "auth_user_policies" in s)
+    assert "LIMIT" in query and "auth_policies.statement" not in query
+
+def test_negotiate(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.negotiate("gzip, deflate, br") == "gzip"
+    assert compression.negotiate("gzip;q=0") is None
+    assert compression.negotiate("") is None
+
+def test_large_responses_are_compressed(client, auth_headers):
+    for n in range(20):
+        client.post("/api/v1/auth/policies", headers=auth_headers, json={"name": f"big{n:02}", "statement": STATEMENT})
+    big = client.get("/api/v1/auth/policies?prefix=big", headers=dict(auth_headers, **{"Accept-Encoding": "gzip"}))
+    assert len(big.content) >= compression.MINIMUM_SIZE
+    assert big.headers["content-encoding"] == "gzip"
+    assert big.headers["vary"] == "Accept-Encoding"
+    assert len(big.json()["results"]) == 20
+
+    small = client.get("/api/v1/config/version", headers=dict(auth_headers, **{"Accept-Encoding": "gzip"}))
+    assert "content-encoding" not in small.headers
@@ -0,0 +1,38 @@
+import pytest
+from logic import get_effective_policies
+from models import User, Group, Policy, AccessKey
+import repository
+
+@pytest.fixture
+def data(db_session):
+    p1 = Policy(id="p1", statement=[{"effect": "allow", "action": ["fs:ReadObject"], "resource": "*"}])
+    p2 = Policy(id="p2", statement=[{"effect": "deny", "action": ["fs:WriteObject"], "resource": "*"}])
+    p3 = Policy(id="p3", statement=[])
+    g1 = Group(id="g1", policies=[p1, p2])
+    user = User(id="u1", policies=[p1], groups=[g1])
+    db_session.add_all([p3, user, AccessKey(access_access_key_id="AK1", access_secret_access_key="s", user=user)])
+    db_session.commit()
+    db_session.expunge_all()
+    return db_session
+
+def test_lookups(data):
+    db = data
+    assert repository.get_user(db, "u1").id == "u1"
+    assert repository.get_user(db, "missing") is None
+    assert repository.user_exists(db, "u1") and not repository.user_exists(db, "missing")
+    assert repository.get_group(db, "g1").id == "g1"
+    assert repository.get_policy(db, "p3").id == "p3"
+    assert sorted(p.id for p in repository.get_policies(db, ["p1", "p3", "missing"])) == ["p1", "p3"]
+    assert repository.get_access_key(db, "AK1").user_id == "u1"
+    assert repository.get_user_access_key(db, "u1", "AK1") is not None
+    assert repository.get_user_access_key(db, "other", "AK1") is None
+
+def test_effective_policies_match_relationship_walk(data):
+    db = data
+    expected = sorted(p.id for p in get_effective_policies(repository.get_user(db, "u1")))
+    assert [p.id for p in repository.get_effective_policies(db, "u1")] == expected == ["p1", "p2"]
+
+def test_access_key_bundle(data):
+    rows = repository.get_access_key_bundle(data, "AK1")
+    assert [(key.access_access_key_id, user.id, group_id) for key, user, group_id in rows] == [("AK1", "u1", "g1")]
+    assert repository.get_access_key_bundle(data, "missing") == []
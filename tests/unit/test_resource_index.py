@@ -0,0 +1,50 @@
+import pytest
+from logic import wildcard_match
+from resource_index import ResourceIndex, literal_prefix
+from statements import intern_all
+
+def test_wildcard_match():
+    assert wildcard_match("arn:lakefs:fs:::repository/foo/*", "arn:lakefs:fs:::repository/foo/object/a")
+    assert not wildcard_match("arn:lakefs:fs:::repository/foo/*", "arn:lakefs:fs:::repository/foobar")
+    assert wildcard_match("fs:Read*", "fs:ReadObject")
+    assert wildcard_match("repo-?", "repo-1")
+    assert not wildcard_match("repo.x", "repo-x")
+
+def test_literal_prefix():
+    assert literal_prefix("arn:lakefs:fs:::repository/foo/*") == "arn:lakefs:fs:::repository/foo/"
+    assert literal_prefix("*") == ""
+    assert literal_prefix("arn:lakefs:auth:::user/alice") == "arn:lakefs:auth:::user/alice"
+
+def test_index_match_and_incremental_updates():
+    index = ResourceIndex()
+    index.put("FooRead", intern_all([{"effect": "allow", "resource": "arn:lakefs:fs:::repository/foo/*", "action": ["fs:Read*"]}]))
+    index.put("DenyFoo", intern_all([{"effect": "deny", "resource": '["arn:lakefs:fs:::repository/foo/*"]', "action": ["fs:*"]}]))
+    index.put("BarRead", intern_all([{"effect": "allow", "resource": "arn:lakefs:fs:::repository/bar/*", "action": ["fs:Read*"]}]))
+
+    resource = "arn:lakefs:fs:::repository/foo/object/a"
+    assert index.match("fs:ReadObject", resource) == {"FooRead": {"allow"}, "DenyFoo": {"deny"}}
+    assert index.match("fs:WriteObject", resource) == {"DenyFoo": {"deny"}}
+
+    index.remove("DenyFoo")
+    index.put("FooRead", intern_all([{"effect": "allow", "resource": "arn:lakefs:fs:::repository/foo/branch/*", "action": ["fs:Read*"]}]))
+    assert index.match("fs:ReadObject", resource) == {}
+
+def test_resource_access_endpoint(client, auth_headers):
+    statement = [{"effect": "allow", "resource": "arn:lakefs:fs:::repository/foo/*", "action": ["fs:Read*"]}]
+    client.post("/api/v1/auth/policies", headers=auth_headers, json={"name": "FooRead", "statement": statement})
+    client.post("/api/v1/auth/users", headers=auth_headers, json={"username": "kim"})
+    client.post("/api/v1/auth/users", headers=auth_headers, json={"username": "lee"})
+    client.post("/api/v1/auth/groups", headers=auth_headers, json={"id": "foo-readers"})
+    client.put("/api/v1/auth/groups/foo-readers/members/kim", headers=auth_headers)
+    client.put("/api/v1/auth/groups/foo-readers/policies/FooRead", headers=auth_headers)
+    client.put("/api/v1/auth/users/lee/policies/FooRead", headers=auth_headers)
+
+    params = {"action": "fs:ReadObject", "resource": "arn:lakefs:fs:::repository/foo/object/a"}
+    data = client.get("/api/v1/auth/resource_access", headers=auth_headers, params=params).json()
+    assert [(u["id"], u["effect"], u["via_groups"]) for u in data["users"]] == [("kim", "allow", ["foo-readers"]), ("lee", "allow", [])]
+    assert [(g["id"], g["policies"]) for g in data["groups"]] == [("foo-readers", ["FooRead"])]
+
+    # Deleting the policy is applied to the index on commit
+    client.delete("/api/v1/auth/policies/FooRead", headers=auth_headers)
+    data = client.get("/api/v1/auth/resource_access", headers=auth_headers, params=params).json()
+    assert data["users"] == [] and data["groups"] == []
@@ -0,0 +1,79 @@
+import pytest
+import os
+import time
+from models import User, AccessKey, Group, Policy
+from shared_cache import SharedCache
+import shared_cache
+import security
+
+def test_set_get_delete():
+    cache = SharedCache(slots=64, slot_size=256, ttl=60)
+    assert cache.get("k") is None
+    assert cache.set("k", {"a": 1})
+    assert cache.get("k") == {"a": 1}
+
+    cache.delete("k")
+    assert cache.get("k") is None
+
+def test_clear_and_ttl():
+    cache = SharedCache(slots=64, slot_size=256, ttl=0.05)
+    cache.set("k", 1)
+    cache.clear()
+    assert cache.get("k") is None
+
+    cache.set("k", 1)
+    time.sleep(0.1)
+    assert cache.get("k") is None
+
+def test_stale_version_is_not_stored():
+    """A value read before an invalidation must not be cached after it"""
+    cache = SharedCache(slots=64, slot_size=256, ttl=60)
+    version = cache.version()
+    cache.delete("other")
+    assert not cache.set("k", "stale", version=version)
+    assert cache.get("k") is None
+
+def test_oversized_value_is_skipped():
+    cache = SharedCache(slots=64, slot_size=64, ttl=60)
+    assert not cache.set("k", "x" * 100)
+    assert cache.get("k") is None
+
+def test_visible_across_fork():
+    """Entries written by a child process are read by the parent"""
+    cache = SharedCache(slots=64, slot_size=256, ttl=60)
+    pid = os.fork()
+    if pid == 0:
+        cache.set("from-child", [1, 2, 3])
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert cache.get("from-child") == [1, 2, 3]
+
+def test_get_credentials_invalidated_on_delete(client, db_session, auth_headers):
+    db_session.add(User(id="carol", created_at=int(time.time())))
+    db_session.add(AccessKey(
+        access_access_key_id="AKCAROL",
+        access_secret_access_key=security.encrypt_secret("s3cret"),
+        user_id="carol",
+        created_at=int(time.time())
+    ))
+    db_session.commit()
+
+    assert client.get("/api/v1/auth/credentials/AKCAROL", headers=auth_headers).status_code == 200
+    assert shared_cache.credentials.get("AKCAROL")["user_id"] == "carol"
+
+    response = client.delete("/api/v1/auth/users/carol/credentials/AKCAROL", headers=auth_headers)
+    assert response.status_code == 204
+    assert shared_cache.credentials.get("AKCAROL") is None
+    assert client.get("/api/v1/auth/credentials/AKCAROL", headers=auth_headers).status_code == 404
+
+def test_effective_policies_invalidated_on_membership(client, db_session, auth_headers):
+    policy = Policy(id="p1", statement=[], created_at=int(time.time()))
+    db_session.add(Group(id="g1", created_at=int(time.time()), policies=[policy]))
+    db_session.add(User(id="dave", created_at=int(time.time())))
+    db_session.commit()
+
+    url = "/api/v1/auth/users/dave/policies?effective=true"
+    assert client.get(url, headers=auth_headers).json()["results"] == []
+
+    client.put("/api/v1/auth/groups/g1/members/dave", headers=auth_headers)
+    assert [p["name"] for p in client.get(url, headers=auth_headers).json()["results"]] == ["p1"]
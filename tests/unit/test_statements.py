@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import create_engine, event, func, inspect, select, text, update
+from models import Policy
+import migrations
+import statements
+
+READ = [{"effect": "allow", "resource": "*", "action": ["fs:ReadObject", "fs:ListObjects"]}]
+
+def test_equal_statements_share_hash_and_object():
+    a = statements.intern({"effect": "allow", "resource": "*", "action": ["fs:b", "fs:a"], "condition": None})
+    b = statements.intern({"condition": None, "resource": "*", "action": ["fs:b", "fs:a"], "effect": "allow"})
+    assert a == b
+    assert statements.resolve(None, [a])[0] is statements.resolve(None, [b])[0]
+
+def test_statements_are_stored_as_submitted():
+    submitted = {"effect": "allow", "resource": "*", "action": ["fs:b", "fs:a", "fs:a"], "condition": None}
+    h = statements.intern(submitted)
+    assert statements.get(h) == submitted
+    assert h != statements.intern(dict(submitted, action=["fs:a", "fs:b"]))
+
+def test_policies_share_statement_rows(client, db_session, auth_headers):
+    for name in ["RepoA", "RepoB"]:
+        client.post("/api/v1/auth/policies", headers=auth_headers, json={"name": name, "statement": READ})
+
+    assert db_session.execute(select(func.count()).select_from(statements.policy_statements)).scalar() == 1
+    a, b = db_session.get(Policy, "RepoA"), db_session.get(Policy, "RepoB")
+    assert a.statement_hashes == b.statement_hashes
+    assert a.statement[0] is b.statement[0]
+
+    # GET returns the document that was PUT
+    policy = client.get("/api/v1/auth/policies/RepoB", headers=auth_headers).json()
+    assert policy["statement"][0]["action"] == ["fs:ReadObject", "fs:ListObjects"]
+    # Replicas on the previous release read the inline copy
+    assert a.inline_statement == [dict(READ[0], condition=None)]
+
+def test_unchanged_update_writes_nothing(client, db_session, auth_headers):
+    client.post("/api/v1/auth/policies", headers=auth_headers, json={"name": "RepoA", "statement": READ})
+
+    updates = []
+    listener = lambda conn, cursor, statement, *args: updates.append(statement) if statement.startswith("UPDATE") else None
+    event.listen(db_session.bind, "before_cursor_execute", listener)
+    try:
+        reordered_keys = [dict(reversed(list(READ[0].items())))]
+        assert client.put("/api/v1/auth/policies/RepoA", headers=auth_headers, json={"name": "RepoA", "statement": reordered_keys}).status_code == 200
+    finally:
+        event.remove(db_session.bind, "before_cursor_execute", listener)
+    assert updates == []
+
+def test_migration_copies_inline_statements():
+    engine = create_engine("sqlite:///:memory:")
+    migrations.run_migrations(engine)
+    # Simulate a policy written before statements were interned (or by a replica on the previous release)
+    with engine.begin() as conn:
+        conn.execute(text("""INSERT INTO auth_policies (id, statement) VALUES ('Legacy', '[{"effect": "allow", "resource": "*", "action": ["fs:*"]}]')"""))
+        conn.execute(text("DELETE FROM acl_schema_version WHERE version >= 8"))
+
+    migrations.run_migrations(engine)
+    # Expand only: the inline column stays for replicas on the previous release
+    assert "statement" in {c["name"] for c in inspect(engine).get_columns("auth_policies")}
+    with engine.connect() as conn:
+        hashes = conn.execute(select(Policy.statement_hashes).where(Policy.id == "Legacy")).scalar()
+        assert statements.resolve(conn, hashes) == [{"effect": "allow", "resource": "*", "action": ["fs:*"]}]
+    engine.dispose()
+
+def test_previous_release_writes_to_inline_column_are_read(client, db_session, auth_headers):
+    client.post("/api/v1/auth/policies", headers=auth_headers, json={"name": "RepoA", "statement": READ})
+    # A replica on the previous release only updates the inline column
+    written = [{"effect": "deny", "resource": "*", "action": ["fs:DeleteObject"]}]
+    db_session.execute(update(Policy.__table__).where(Policy.__table__.c.id == "RepoA").values(statement=written))
+    db_session.commit()
+
+    assert client.get("/api/v1/auth/policies/RepoA", headers=auth_headers).json()["statement"][0]["effect"] == "deny"
+
+    # Putting back the statements the stale hashes still describe is a change
+    assert client.put("/api/v1/auth/policies/RepoA", headers=auth_headers, json={"name": "RepoA", "statement": READ}).status_code == 200
+    db_session.expire_all()
+    policy = db_session.get(Policy, "RepoA")
+    assert policy.statement_hashes == statements.intern_all(policy.inline_statement)
+    assert client.get("/api/v1/auth/policies/RepoA", headers=auth_headers).json()["statement"][0]["effect"] == "allow"
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import User, AccessKey
+import security
+import tracing
+import time
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+@pytest.fixture
+def exporter(db_session, monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing, "exporters", [exporter])
+    engine = db_session.bind.engine
+    tracing.install(engine)
+    yield exporter
+    event.remove(engine, "before_cursor_execute", tracing._before_cursor_execute)
+    event.remove(engine, "after_cursor_execute", tracing._after_cursor_execute)
+    event.remove(engine, "handle_error", tracing._handle_error)
+    event.remove(Session, "do_orm_execute", tracing._do_orm_execute)
+    event.remove(Session, "after_begin", tracing._after_begin)
+
+def test_parse_traceparent():
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    assert tracing.parse_traceparent(f"00-{trace_id}-{parent_id}-01") == (trace_id, parent_id, True)
+    assert tracing.parse_traceparent(f"00-{trace_id}-{parent_id}-00")[2] is False
+    assert tracing.parse_traceparent("00-" + "0" * 32 + f"-{parent_id}-01") is None
+    assert tracing.parse_traceparent("garbage") is None
+
+def test_get_credentials_spans(client, db_session, auth_headers, exporter):
+    db_session.add(User(id="tracy", created_at=int(time.time())))
+    db_session.add(AccessKey(access_access_key_id="AKTRACE", access_secret_access_key=security.encrypt_secret("s"), user_id="tracy", created_at=0))
+    db_session.commit()
+    exporter.spans.clear()
+
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    headers = dict(auth_headers, traceparent=f"00-{trace_id}-00f067aa0ba902b7-01")
+    response = client.get("/api/v1/auth/credentials/AKTRACE", headers=headers)
+    assert response.status_code == 200
+
+    spans = {s["name"]: s for s in exporter.spans}
+    server = spans["GET /api/v1/auth/credentials/{accessKeyId}"]
+    assert server["parent_id"] == "00f067aa0ba902b7"
+    assert server["attributes"]["http.status_code"] == 200
+    assert response.headers["traceresponse"] == f"00-{trace_id}-{server['span_id']}-01"
+
+    for name in ["auth.verify_api_token", "db.query", "crypto.decrypt_secret", "response.render"]:
+        assert spans[name]["trace_id"] == trace_id
+        assert spans[name]["parent_id"] == server["span_id"]
+
+def test_unsampled_requests_are_not_traced(client, auth_headers, exporter):
+    headers = dict(auth_headers, traceparent="00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00")
+    client.get("/api/v1/healthcheck", headers=headers)
+    assert exporter.spans == []
@@ -0,0 +1,61 @@
+import pytest
+from models import User
+import json
+import time
+import shared_cache
+
+def _add_user(db_session, user_id, **kwargs):
+    db_session.add(User(id=user_id, created_at=int(time.time()), **kwargs))
+    db_session.commit()
+
+def test_lookup_by_external_id(client, db_session, auth_headers):
+    _add_user(db_session, "grace", email="grace@example.com", external_id="oidc|grace")
+    _add_user(db_session, "heidi", email="heidi@example.com", external_id="oidc|heidi")
+
+    data = client.get("/api/v1/auth/users?external_id=oidc|grace", headers=auth_headers).json()
+    assert [u["username"] for u in data["results"]] == ["grace"]
+
+    data = client.get("/api/v1/auth/users?email=heidi@example.com", headers=auth_headers).json()
+    assert [u["username"] for u in data["results"]] == ["heidi"]
+
+def test_lookup_cache_invalidated_on_create_and_delete(client, db_session, auth_headers):
+    url = "/api/v1/auth/users?external_id=oidc|ivan"
+    assert client.get(url, headers=auth_headers).json()["results"] == []
+
+    client.post("/api/v1/auth/users", headers=auth_headers, json={"username": "ivan", "external_id": "oidc|ivan"})
+    assert [u["username"] for u in client.get(url, headers=auth_headers).json()["results"]] == ["ivan"]
+
+    client.delete("/api/v1/auth/users/ivan", headers=auth_headers)
+    assert client.get(url, headers=auth_headers).json()["results"] == []
+
+def test_lookup_cache_is_shared_and_skips_misses(client, db_session, auth_headers):
+    url = "/api/v1/auth/users?external_id=oidc|judy"
+    assert client.get(url, headers=auth_headers).json()["results"] == []
+    # Created without going through the API: nothing invalidates the cache
+    _add_user(db_session, "judy", external_id="oidc|judy")
+    assert [u["username"] for u in client.get(url, headers=auth_headers).json()["results"]] == ["judy"]
+
+    # Cached in shared memory, where every worker reads and clears it
+    cached = shared_cache.identities.get(json.dumps([None, "oidc|judy", 100]))
+    assert [u["username"] for u in cached["results"]] == ["judy"]
+
+def test_list_user_groups_paginates_in_sql(client, auth_headers):
+    client.post("/api/v1/auth/users", headers=auth_headers, json={"username": "judy"})
+    for group_id in ["devs", "admins", "data-eng", "ops"]:
+        client.post("/api/v1/auth/groups", headers=auth_headers, json={"id": group_id})
+        if group_id != "ops":
+            client.put(f"/api/v1/auth/groups/{group_id}/members/judy", headers=auth_headers)
+
+    page = client.get("/api/v1/auth/users/judy/groups?amount=2", headers=auth_headers).json()
+    assert [g["id"] for g in page["results"]] == ["admins", "data-eng"]
+    assert page["pagination"]["has_more"] is True
+
+    page = client.get(f"/api/v1/auth/users/judy/groups?amount=2&after={page['pagination']['next_offset']}", headers=auth_headers).json()
+    assert [g["id"] for g in page["results"]] == ["devs"]
+    assert page["pagination"]["has_more"] is False
+
+    page = client.get("/api/v1/auth/users/judy/groups?prefix=d", headers=auth_headers).json()
+    assert [g["id"] for g in page["results"]] == ["data-eng", "devs"]
+
+def test_list_user_groups_unknown_user(client, auth_headers):
+    assert client.get("/api/v1/auth/users/nobody/groups", headers=auth_headers).status_code == 404